@@ -0,0 +1,67 @@
+import { fetchWithAuth } from "../components/account/auth.ts";
+
+interface UploadPart {
+    part_number: number;
+    url: string;
+}
+
+interface PresignedUpload {
+    token: string;
+    key: string;
+    multipart: boolean;
+    // обычная загрузка: форма для POST в MinIO
+    url?: string;
+    fields?: Record<string, string>;
+    // multipart: PUT каждой части по своей ссылке
+    part_size?: number;
+    parts?: UploadPart[];
+}
+
+/**
+ * Uploads the file straight to MinIO: `${baseUrl}presign/` gives a signed form
+ * (or part URLs for large files), then `${baseUrl}confirm/` records it in Django.
+ * Returns the response of the failed step or of confirm, so callers handle it
+ * the same way as the old multipart upload.
+ */
+export const directUpload = async (baseUrl: string, file: File): Promise<Response> => {
+    const presign = await fetchWithAuth(`${baseUrl}presign/`, {
+        method: "POST",
+        body: JSON.stringify({ filename: file.name, size: file.size, content_type: file.type }),
+    });
+    if (!presign.ok) return presign;
+    const upload: PresignedUpload = await presign.json();
+
+    const parts: { part_number: number; etag: string }[] = [];
+    try {
+        if (upload.multipart && upload.parts && upload.part_size) {
+            for (const part of upload.parts) {
+                const start = (part.part_number - 1) * upload.part_size;
+                const response = await fetch(part.url, {
+                    method: "PUT",
+                    body: file.slice(start, start + upload.part_size),
+                });
+                if (!response.ok) throw new Error(`Part ${part.part_number} failed: ${response.status}`);
+                parts.push({ part_number: part.part_number, etag: response.headers.get("ETag") || "" });
+            }
+        } else {
+            const form = new FormData();
+            Object.entries(upload.fields || {}).forEach(([name, value]) => form.append(name, value));
+            form.append("file", file); // file должен быть последним полем формы
+            const response = await fetch(upload.url!, { method: "POST", body: form });
+            if (!response.ok) throw new Error(`Upload failed: ${response.status}`);
+        }
+    } catch (error) {
+        if (upload.multipart) {
+            await fetchWithAuth(`${baseUrl}abort/`, {
+                method: "POST",
+                body: JSON.stringify({ token: upload.token }),
+            });
+        }
+        throw error;
+    }
+
+    return fetchWithAuth(`${baseUrl}confirm/`, {
+        method: "POST",
+        body: JSON.stringify({ token: upload.token, parts }),
+    });
+};
@@ -1,5 +1,6 @@
 import {useState, useEffect, useContext, useRef, useCallback} from "react";
 import { fetchWithAuth } from "../account/auth";
+import { directUpload } from "../../api/directUpload";
 import {useParams, Link} from "react-router-dom";
 import { FontAwesomeIcon } from "@fortawesome/react-fontawesome";
 import {
@@ -39,18 +40,11 @@ const Invoices: React.FC = () => {
         const file = event.target.files?.[0];
         if (!file) return;
 
-        const formData = new FormData();
-        formData.append('file', file);
         setIsUploading(prev => ({ ...prev, [reportId]: true }));
 
         try {
-            const response = await fetchWithAuth(
-                `${BASE_URL}/admin/adminpanel/user/report/${reportId}/upload/`,
-                {
-                    method: "POST",
-                    body: formData
-                }
-            );
+            // большие счета уходят в MinIO частями, Django только подписывает и подтверждает
+            const response = await directUpload(`${BASE_URL}/admin/adminpanel/user/report/${reportId}/upload/`, file);
 
             if (response.ok) {
                 const newFile: ReportFile = await response.json();
@@ -106,10 +100,10 @@ const Invoices: React.FC = () => {
         fileInputRefs.current[reportId]?.click();
     };
 
-    const downloadFile = useCallback(async (filename: string) => {
+    const downloadFile = useCallback(async (fileId: number, filename: string) => {
         try {
             const cleanName = filename.split('/').pop()?.split('?')[0] || 'document.pdf';
-            const response = await fetchWithAuth(`${BASE_URL}/admin/adminpanel/customer/documents/download/${cleanName}/`);
+            const response = await fetchWithAuth(`${BASE_URL}/admin/adminpanel/invoices/${fileId}/download/`);
             if (!response.ok) throw new Error("Download failed");
 
             const blob = await response.blob();
@@ -226,7 +220,7 @@ const Invoices: React.FC = () => {
                                                 {report.files.length > 0 ? (
                                                     report.files.map((file) => (
                                                         <div key={file.id} className="col-12 form-control mb-1" style={{ display: 'flex' }}>
-                                                            <span style={{ cursor: 'pointer', display: 'flex', alignItems: 'center' }} onClick={() => downloadFile(file.file)}>
+                                                            <span style={{ cursor: 'pointer', display: 'flex', alignItems: 'center' }} onClick={() => downloadFile(file.id, file.file)}>
                                                                 <FontAwesomeIcon icon={faFilePdf} className="file-uploaded" />
                                                                 <span style={{ marginLeft: '5px' }}>{file.file.split('/').pop()?.split('?')[0]}</span>
                                                             </span>
@@ -1,5 +1,6 @@
 import React, { useRef, useState, useEffect, useContext } from 'react';
 import { fetchWithAuth } from "../account/auth";
+import { directUpload } from "../../api/directUpload";
 import { FontAwesomeIcon } from '@fortawesome/react-fontawesome';
 import {faFilePdf, faSpinner} from "@fortawesome/free-solid-svg-icons";
 import {Skeleton} from "@mui/material";
@@ -57,16 +58,10 @@ const UploadFileAdmin: React.FC<UploadFileAdminProps> = ({ onUploadSuccess, cust
 
         setIsUploading(true);
         setError('');
-        const formData = new FormData();
-        formData.append('file', file);
-        formData.append('customer', customer_id.toString());
 
         let responseData: any;
         try {
-            const response = await fetchWithAuth(`${BASE_URL}/admin/adminpanel/customer/documents/${customer_id}/`, {
-                method: 'POST',
-                body: formData,
-            });
+            const response = await directUpload(`${BASE_URL}/admin/adminpanel/customer/documents/${customer_id}/`, file);
             responseData = await response.json();
             if (response.status === 201) {
                 setSuccess('Soubor byl úspěšně nahrán.');
@@ -117,9 +112,9 @@ const UploadFileAdmin: React.FC<UploadFileAdminProps> = ({ onUploadSuccess, cust
         }
     };
 
-    const downloadFile = async (filename: string) => {
+    const downloadFile = async (fileId: number, filename: string) => {
         try {
-            const response = await fetchWithAuth(`${BASE_URL}/admin/adminpanel/customer/documents/download/${filename}/`);
+            const response = await fetchWithAuth(`${BASE_URL}/admin/adminpanel/customer/documents/${fileId}/download/`);
             if (!response.ok) throw new Error("Download failed");
 
             const blob = await response.blob();
@@ -203,7 +198,7 @@ const UploadFileAdmin: React.FC<UploadFileAdminProps> = ({ onUploadSuccess, cust
                             <div className="col-12 form-control mb-2" style={{ display: 'flex' }} key={index}>
                                 <span
                                     style={{ cursor: 'pointer', display: 'flex', alignItems: 'center' }}
-                                    onClick={() => downloadFile(file.file.split('/').pop()?.split('?')[0] || 'document.pdf')}
+                                    onClick={() => downloadFile(file.id, file.file.split('/').pop()?.split('?')[0] || 'document.pdf')}
                                 >
                                     <FontAwesomeIcon icon={faFilePdf} className="file-uploaded" />
                                     <span style={{ marginLeft: '5px' }}>{file.file.split('/').pop()?.split('?')[0]}</span>
@@ -5,6 +5,7 @@ import { FontAwesomeIcon } from '@fortawesome/react-fontawesome';
 import { faFilePdf } from "@fortawesome/free-solid-svg-icons";
 
 interface FileData {
+    id: number;
     file: string;
 }
 
@@ -27,9 +28,9 @@ const DocumentsBlock: React.FC = () => {
         }
     };
 
-    const downloadFile = async (filename: string) => {
+    const downloadFile = async (fileId: number, filename: string) => {
         try {
-            const response = await fetchWithAuth(`${BASE_URL}/customer/documents/download/${filename}/`, {
+            const response = await fetchWithAuth(`${BASE_URL}/customer/documents/${fileId}/download/`, {
                 method: "GET"
             });
 
@@ -76,7 +77,7 @@ const DocumentsBlock: React.FC = () => {
                                     key={index}
                                     className="col-12"
                                     style={{ cursor: 'pointer' }}
-                                    onClick={() => downloadFile(fileName)}
+                                    onClick={() => downloadFile(file.id, fileName)}
                                 >
                                     <div className="form-control">
                                         <FontAwesomeIcon icon={faFilePdf} className="file-uploaded" />
@@ -1,6 +1,7 @@
 import React, { useRef, useState, useEffect, useContext } from 'react';
 import { LanguageContext } from "../../context/LanguageContext.js";
 import { fetchWithAuth } from "../account/auth.ts";
+import { directUpload } from "../../api/directUpload.ts";
 import { FontAwesomeIcon } from '@fortawesome/react-fontawesome';
 import {faFilePdf, faSpinner} from "@fortawesome/free-solid-svg-icons";
 
@@ -53,14 +54,9 @@ const UploadFile: React.FC<UploadFileProps> = ({ onUploadSuccess }) => {
 
         setIsUploading(true);
         setError('');
-        const formData = new FormData();
-        formData.append('file', file);
 
         try {
-            const response = await fetchWithAuth(`${BASE_URL}/customer/documents/upload/`, {
-                method: 'POST',
-                body: formData,
-            });
+            const response = await directUpload(`${BASE_URL}/customer/documents/upload/`, file);
             // const responseText = await response.text();
             // console.log("Response text:", responseText);
             const responseData = await response.json();
@@ -33,10 +33,10 @@ const ReportList: React.FC = () => {
     const BASE_URL = import.meta.env.VITE_API_URL;
     const { currentData } = useContext(LanguageContext);
 
-    const downloadFile = useCallback(async (filename: string) => {
+    const downloadFile = useCallback(async (fileId: number, filename: string) => {
         try {
             const cleanName = filename.split('/').pop()?.split('?')[0] || 'document.pdf';
-            const response = await fetchWithAuth(`${BASE_URL}/admin/adminpanel/customer/documents/download/${cleanName}/`);
+            const response = await fetchWithAuth(`${BASE_URL}/customer/invoices/${fileId}/download/`);
             if (!response.ok) throw new Error("Download failed");
 
             const blob = await response.blob();
@@ -140,7 +140,7 @@ const ReportList: React.FC = () => {
                                                         <button
                                                             key={file.id}
                                                             className="btn btn-download me-3"
-                                                            onClick={() => downloadFile(file.file)}
+                                                            onClick={() => downloadFile(file.id, file.file)}
                                                         >
                                                             <DarkTooltip title="Download invoice" placement="top" arrow>
                                                                 <FontAwesomeIcon
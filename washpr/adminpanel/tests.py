@@ -1,3 +1,36 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from order.tests import create_customer_orders
+
+User = get_user_model()
+
+
+class UserOrdersAdminQueriesTest(TestCase):
+    """ get_user_orders_admin loads places with a join: one query whatever the number of orders. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.places = create_customer_orders("customer@example.com")
+        cls.admin = User.objects.create_user(email="admin@example.com", password="test", is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_get_user_orders_admin(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("get_user_orders_admin", args=[self.user.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["orders"]), 12)
+        self.assertEqual(len({order["place_name"] for order in response.data["orders"]}), 3)
+
+    def test_get_user_orders_admin_filtered(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("get_user_orders_admin", args=[self.user.id]), {"place": self.places[1].id}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({order["place_name"] for order in response.data["orders"]}, {"Place 1"})
@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import *
-from customer.views import DownloadAnyDocumentView
+from customer.views import DocumentDownloadView, DownloadAnyDocumentView
+from order.models import ReportFile
 
 
 urlpatterns = [
@@ -12,20 +13,36 @@ urlpatterns = [
     path('customer-place/list/<int:customer_id>/', customers_places, name='customers_places'),
     path('customer/put/<int:customer_id>/', put_customer, name='put_customer'),
     path('customer/documents/<int:customer_id>/', upload_document, name='upload_document'),
+    path('customer/documents/<int:customer_id>/presign/', presign_document_upload_admin, name='presign_document_upload_admin'),
+    path('customer/documents/<int:customer_id>/confirm/', confirm_document_upload_admin, name='confirm_document_upload_admin'),
     path('customer/documents/list/<int:customer_id>/', list_customer_documents_admin, name='list_customer_documents'),
     path('customer/documents/for-customer/<int:customer_id>/', list_documents_for_customer_admin, name='list_documents_for_customer_admin'),
     path('customer/documents/<int:file_id>/delete/<int:customer_id>/', delete_document_admin, name='delete_document_admin'),
     path('place-detail/<int:place_id>/', get_place_detail_admin, name='get_place_detail_admin'),
     path('order/photos/<int:place_id>/', get_photo_reports_admin, name='get_photo_reports_admin'),
     path('all-photos/<int:customer_id>/', get_all_photo_reports_admin, name='get_all_photo_reports_admin'),
+    path('photos/export/<int:customer_id>/', export_photos_zip_admin, name='export_photos_zip_admin'),
     path('user-orders/<int:customer_id>/', get_user_orders_admin, name='get_user_orders_admin'),
     path('user/reports/<int:customer_id>/', get_user_report_admin, name='get_user_invoices'),
     path('user/report/<int:report_id>/upload/', upload_report_file, name='upload_report_file'),
+    path('user/report/<int:report_id>/upload/presign/', presign_report_file_upload, name='presign_report_file_upload'),
+    path('user/report/<int:report_id>/upload/confirm/', confirm_report_file_upload, name='confirm_report_file_upload'),
+    path('user/report/<int:report_id>/upload/abort/', abort_report_file_upload, name='abort_report_file_upload'),
     path('user/report/<int:report_id>/delete-file/<int:file_id>/',
          delete_report_file,
          name='delete_report_file'),
     path('customers/', all_customers, name='all_customers'),
     path('customers/search/', search_customers, name='search_customers'),
+    path(
+        "customer/documents/<int:pk>/download/",
+        DocumentDownloadView.as_view(),
+        name="admin-document-download-by-id"
+    ),
+    path(
+        "invoices/<int:pk>/download/",
+        DocumentDownloadView.as_view(model=ReportFile, owner_field="report__customer__user"),
+        name="admin-invoice-download-by-id"
+    ),
     path(
         "customer/documents/download/<str:filename>/",
         DownloadAnyDocumentView.as_view(),
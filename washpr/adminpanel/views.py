@@ -20,7 +20,6 @@ from rest_framework.parsers import MultiPartParser
 from django.http import HttpResponse
 from django.conf import settings
 from urllib.parse import urlparse, quote
-import boto3
 
 from customer.serializers import CustomerGetSerializer
 from place.models import Place
@@ -30,8 +29,7 @@ from customer.models import DocumentsForCustomer
 from customer.serializers import CustomerDocumentSerializer
 from customer.serializers import DocumentForCustomerSerializer
 from order.models import PhotoReport
-from order.serializers import PhotoReportSerializer
-from order.serializers import GetOrderSerializer
+from order.views import include_report_orders, photo_reports_response, report_list_queryset, user_orders_response
 from order.models import OrderReport
 from order.serializers import OrderReportSerializer
 from order.models import ReportFile
@@ -39,6 +37,9 @@ from order.serializers import ReportFileSerializer
 from customer.serializers import CustomerSerializer
 from rest_framework.views import APIView
 
+from customer.views import record_document_upload, start_document_upload
+from utils.uploads import abort_multipart, begin_upload, finish_upload, guess_content_type, read_upload
+from integration.archives import filter_photos_for_export, photos_zip_response
 from integration.tasks import create_client_task, send_email_change_customer_task, send_new_customer_task
 
 
@@ -124,6 +125,26 @@ def upload_document(request, customer_id):
         return Response({"error": "Invalid data", "details": serializer.errors}, status=400)
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def presign_document_upload_admin(request, customer_id):
+    try:
+        customer = Customer.objects.get(user__id=customer_id)
+    except Customer.DoesNotExist:
+        return Response({"error": "Customer not found"}, status=404)
+    return start_document_upload(customer, request.data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def confirm_document_upload_admin(request, customer_id):
+    try:
+        customer = Customer.objects.get(user__id=customer_id)
+    except Customer.DoesNotExist:
+        return Response({"error": "Customer not found"}, status=404)
+    return record_document_upload(customer, request.data)
+
+
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def list_customer_documents_admin(request, customer_id):
@@ -185,43 +206,39 @@ def get_place_detail_admin(request, place_id):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def get_photo_reports_admin(request, place_id):
-    try:
-        photos = PhotoReport.objects.filter(order__place__id=place_id)
-        serializer = PhotoReportSerializer(photos, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return photo_reports_response(request, PhotoReport.objects.filter(order__place__id=place_id))
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def get_all_photo_reports_admin(request, customer_id):
-    try:
-        photos = PhotoReport.objects.filter(order__user__id=customer_id)
-        serializer = PhotoReportSerializer(photos, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return photo_reports_response(request, PhotoReport.objects.filter(order__user__id=customer_id))
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
-def get_user_orders_admin(request, customer_id):
+def export_photos_zip_admin(request, customer_id):
     try:
-        orders = Order.objects.filter(user__id=customer_id)
-        serializer = GetOrderSerializer(orders, many=True)
-        return Response({
-            "user_id": customer_id,
-            "orders": serializer.data,
+        photos, label = filter_photos_for_export(PhotoReport.objects.filter(order__user__id=customer_id), request.GET)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return photos_zip_response(photos, f"photos-{customer_id}-{label}.zip")
 
-        }, status=status.HTTP_200_OK)
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_user_orders_admin(request, customer_id):
+    # те же фильтры и постраничный вывод, что у клиента в order/all-orders/
+    return user_orders_response(request, customer_id)
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def get_user_report_admin(request, customer_id):
     try:
-        reports = OrderReport.objects.filter(customer__user__id=customer_id).order_by("-report_month")
-        serializer = OrderReportSerializer(reports, many=True)
+        # Invoices.tsx показывает id заказов, поэтому по умолчанию они включены (?include_orders=false - без них)
+        include_orders = include_report_orders(request, default=True)
+        reports = report_list_queryset(
+            OrderReport.objects.filter(customer__user__id=customer_id).order_by("-report_month"),
+            include_orders=include_orders,
+        )
+        serializer = OrderReportSerializer(reports, many=True, context={"include_orders": include_orders})
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -243,6 +260,52 @@ def upload_report_file(request, report_id):
     return Response(serializer.data)
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def presign_report_file_upload(request, report_id):
+    """ Presigned POST, or part URLs for S3 multipart when the file is above UPLOAD_MULTIPART_THRESHOLD. """
+    report = get_object_or_404(OrderReport.objects.select_related("customer__user"), id=report_id)
+    filename = request.data.get("filename") or ""
+    try:
+        payload = begin_upload(
+            ReportFile(report=report), report.pk, filename, int(request.data.get("size") or 0),
+            request.data.get("content_type") or guess_content_type(filename),
+            settings.REPORT_FILE_MAX_SIZE, allow_multipart=True,
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return Response(payload)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def confirm_report_file_upload(request, report_id):
+    """ {"token": ..., "parts": [{"part_number": 1, "etag": "..."}]} - parts only for multipart. """
+    report = get_object_or_404(OrderReport, id=report_id)
+    try:
+        key = finish_upload(
+            request.data.get("token"), ReportFile, report.pk, settings.REPORT_FILE_MAX_SIZE,
+            parts=request.data.get("parts"),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    report_file = ReportFile.objects.create(report=report, file=key)
+    return Response(ReportFileSerializer(report_file).data, status=201)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def abort_report_file_upload(request, report_id):
+    try:
+        upload = read_upload(request.data.get("token"), ReportFile, report_id)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    # уже загруженные части иначе так и останутся в бакете
+    if upload["upload_id"]:
+        abort_multipart(upload["key"], upload["upload_id"])
+    return Response({'success': True})
+
+
 @api_view(['DELETE'])
 @permission_classes([IsAdminUser])
 def delete_report_file(request, report_id, file_id):
@@ -44,24 +44,22 @@ class Customer(models.Model):
     change_data = models.BooleanField("Change data", default=False)
 
     def save(self, *args, **kwargs):
-        if not Customer.objects.filter(pk=self.pk).exists():
-            # Если объект новый, сначала сохраняем его, чтобы получить pk
-            super().save(*args, **kwargs)
-            # Если поле rp_client_external_id ещё не заполнено, формируем его, используя pk
+        # create() передаёт force_insert, загруженный из базы объект точно есть - exists() не нужен.
+        # Customer(user=u).save() для уже существующего user_id остаётся обновлением, как раньше
+        is_new = kwargs.get("force_insert") or (
+            self._state.adding and not Customer.objects.filter(pk=self.pk).exists()
+        )
+        if is_new:
+            # pk = user_id известен заранее, поэтому rp_client_external_id
+            # заполняем до INSERT, без второго UPDATE
             if not self.rp_client_external_id:
                 self.rp_client_external_id = "zakaznik_" + str(self.pk)
                 self.company_name = self.new_company_name
                 self.company_address = self.new_company_address
                 self.company_ico = self.new_company_ico
                 self.company_dic = self.new_company_dic
-            # Обновляем запись с новым значением rp_client_external_id
-            super().save(update_fields=[
-                'rp_client_external_id',
-                'company_name',
-                'company_address',
-                'company_ico',
-                'company_dic',
-            ])
+            kwargs["force_insert"] = True
+            super().save(*args, **kwargs)
             # send_new_customer_task.delay(self.company_name)
             return
         else:
@@ -93,18 +91,27 @@ class Customer(models.Model):
         verbose_name_plural = 'Companies info'
 
 
+# Правила для документов клиента - те же проверяет политика presigned POST (utils.uploads)
+DOCUMENT_MAX_SIZE = 2 * 1024 * 1024  # 2 MB
+DOCUMENT_CONTENT_TYPES = {
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+}
+
+
 def validate_file_size(value):
     """ Проверка размера файла (не более 2MB). """
     filesize = value.size
-    if filesize > 2 * 1024 * 1024:  # 2 MB
+    if filesize > DOCUMENT_MAX_SIZE:
         raise ValidationError('The maximum file size that can be uploaded is 2MB.')
 
 
 def validate_file_extension(value):
     """ Проверка разрешенных расширений файлов. """
     ext = os.path.splitext(value.name)[1].lower()
-    valid_extensions = ['.pdf', '.jpg', '.jpeg', '.png']
-    if ext not in valid_extensions:
+    if ext not in DOCUMENT_CONTENT_TYPES:
         raise ValidationError('Unsupported file extension. Allowed extensions: PDF, JPG, JPEG, PNG.')
 
 
@@ -124,7 +131,8 @@ class CustomerDocuments(models.Model):
     file = models.FileField(
         storage=MinioMediaStorage(),
         upload_to=customer_document_upload_path,
-        validators=[validate_file_size, validate_file_extension]
+        validators=[validate_file_size, validate_file_extension],
+        db_index=True,
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
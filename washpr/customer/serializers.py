@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from .models import Customer, CustomerDocuments
+from utils.fields import CachedFileUrlsMixin
 
 
 class CustomerSerializer(serializers.ModelSerializer):
@@ -61,7 +62,7 @@ class CustomerGetSerializer(serializers.ModelSerializer):
         read_only_fields = ['user_id', 'date_joined']
 
 
-class CustomerDocumentSerializer(serializers.ModelSerializer):
+class CustomerDocumentSerializer(CachedFileUrlsMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomerDocuments
         fields = ['id', 'customer', 'file', 'uploaded_at']
@@ -70,7 +71,7 @@ class CustomerDocumentSerializer(serializers.ModelSerializer):
         }
 
 
-class DocumentForCustomerSerializer(serializers.ModelSerializer):
+class DocumentForCustomerSerializer(CachedFileUrlsMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomerDocuments
         fields = ['id', 'customer', 'file', 'uploaded_at']
@@ -1,56 +1,10 @@
-import time
-import requests
 from celery import shared_task
-from celery.exceptions import MaxRetriesExceededError
 from django.conf import settings
 from django.db import close_old_connections
 from django.core.mail import send_mail
 
-# Класс для работы с внешним API
-class RestApiClient:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.retry_after = None
-
-    def call_api(self, url, http_method="GET", params=None):
-        if self.retry_after and time.time() < self.retry_after:
-            print("Rate limit exceeded. Please wait.")
-            return None
-
-        headers = {
-            "X-API-KEY": self.api_key,
-            "accept": "application/json"
-        }
-
-        try:
-            response = requests.request(http_method, url, headers=headers, params=params)
-            self.handle_headers(response)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Request error: {e}")
-            return None
-
-    def handle_headers(self, response):
-        if response.status_code == 429:
-            retry_after = int(response.headers.get('Retry-After', 0))
-            self.retry_after = time.time() + retry_after
-            print(f"Rate limited. Retry after {retry_after} seconds.")
-
-    def create_client(self, client_external_id, client_name):
-        url = "https://online.auto-gps.eu/cnt/apiItinerary/client"
-        params = {
-            "client_external_id": client_external_id,
-            "client_name": client_name
-        }
-        print(params)
-        response = self.call_api(url, http_method="POST", params=params)
-        if response:
-            print("Client created successfully:", response)
-            return response
-        else:
-            print("Failed to create client.")
-            return None
+# Клиент API общий (integration.client): Redis rate limiter и Retry-After для всех процессов
+from integration.client import get_api_client
 
 
 @shared_task
@@ -67,8 +21,7 @@ def create_client_task(customer_id):
     except Customer.DoesNotExist:
         return f"Customer with id {customer_id} not found."
 
-    api_key = settings.EXTERNAL_API_KEY  # API-ключ должен быть задан в settings.py
-    api_client = RestApiClient(api_key)
+    api_client = get_api_client()
 
     client_external_id = customer.rp_client_external_id or f"customer_{customer.pk}"
     client_name = customer.company_name
@@ -5,8 +5,17 @@ urlpatterns = [
     path('data/', customer_view, name='customer_view'),
     path('user/', customer_user_view, name='customer_user_view'),
     path('documents/upload/', upload_document, name='upload_document'),
+    path('documents/upload/presign/', presign_document_upload, name='presign_document_upload'),
+    path('documents/upload/confirm/', confirm_document_upload, name='confirm_document_upload'),
     path('documents/', list_customer_documents, name='list_customer_documents'),
     path('documents/for-customer/', list_documents_for_customer, name='list_documents_for_customer'),
     path('documents/<int:file_id>/delete/', delete_document, name='delete_document'),
+    path('documents/<int:pk>/download/', DocumentDownloadView.as_view(), name="document-download-by-id"),
+    path(
+        'invoices/<int:pk>/download/',
+        DocumentDownloadView.as_view(model=ReportFile, owner_field="report__customer__user"),
+        name="invoice-download-by-id",
+    ),
+    # старый маршрут по имени файла
     path('documents/download/<str:filename>/', DownloadAnyDocumentView.as_view(), name="document-download"),
 ]
@@ -6,20 +6,24 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
-import boto3
 from urllib.parse import quote
 from django.conf import settings
 from urllib.parse import urlparse
+from botocore.exceptions import ClientError
 import logging
+import os
 
-from .models import Customer, CustomerDocuments, DocumentsForCustomer
+from .models import Customer, CustomerDocuments, DocumentsForCustomer, DOCUMENT_CONTENT_TYPES, DOCUMENT_MAX_SIZE
 from .serializers import CustomerSerializer, CustomerGetSerializer, CustomerDocumentSerializer, \
     DocumentForCustomerSerializer
 from order.models import ReportFile
+from utils.downloads import storage_file_response
+from utils.uploads import begin_upload, finish_upload
 
 from integration.tasks import create_client_task, send_email_change_customer_task, send_new_customer_task
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 @api_view(['GET', 'POST', 'PUT'])
@@ -101,6 +105,61 @@ def upload_document(request):
         return Response({"error": "Invalid data", "details": serializer.errors}, status=400)
 
 
+def start_document_upload(customer, data):
+    """
+    Presigned POST for a document of the customer (also used by the admin panel).
+    The policy carries the rules of validate_file_size and validate_file_extension.
+    """
+    if CustomerDocuments.objects.filter(customer=customer).count() >= 5:
+        return Response({"error": "You can't have more 5 files"}, status=400)
+    filename = data.get("filename") or ""
+    content_type = DOCUMENT_CONTENT_TYPES.get(os.path.splitext(filename)[1].lower())
+    if not content_type:
+        return Response({"error": "Invalid data", "details": {
+            "file": ["Unsupported file extension. Allowed extensions: PDF, JPG, JPEG, PNG."]
+        }}, status=400)
+    try:
+        payload = begin_upload(
+            CustomerDocuments(customer=customer), customer.pk, filename,
+            int(data.get("size") or 0), content_type, DOCUMENT_MAX_SIZE,
+        )
+    except ValueError as e:
+        return Response({"error": "Invalid data", "details": {"file": [str(e)]}}, status=400)
+    return Response(payload)
+
+
+def record_document_upload(customer, data):
+    """ The file is already in MinIO, only the row is created. """
+    if CustomerDocuments.objects.filter(customer=customer).count() >= 5:
+        return Response({"error": "You can't have more 5 files"}, status=400)
+    try:
+        key = finish_upload(data.get("token"), CustomerDocuments, customer.pk, DOCUMENT_MAX_SIZE)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    document = CustomerDocuments.objects.create(customer=customer, file=key)
+    return Response({"message": "File uploaded successfully!", "id": document.id}, status=201)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def presign_document_upload(request):
+    try:
+        customer = Customer.objects.get(user=request.user)
+    except Customer.DoesNotExist:
+        return Response({"error": "Customer not found"}, status=404)
+    return start_document_upload(customer, request.data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def confirm_document_upload(request):
+    try:
+        customer = Customer.objects.get(user=request.user)
+    except Customer.DoesNotExist:
+        return Response({"error": "Customer not found"}, status=404)
+    return record_document_upload(customer, request.data)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_customer_documents(request):
@@ -141,34 +200,46 @@ def list_documents_for_customer(request):
     return Response(serializer.data)
 
 
+def find_document_by_name(user, filename):
+    """
+    Lookup for the old /download/<filename>/ routes, only for the customer's own files:
+    exact key customers/<user_id>/<filename>, then an own invoice under invoices/<user_id>/
+    (both served by the file index, the invoice prefix only spans the customer's own files).
+    Staff get 410 from these routes (LEGACY_NAME_GONE): without the folder the name
+    could only be found by a LIKE '%/name' scan, they use the id routes.
+    """
+    # те же пути, что дают customer_document_upload_path и report_file_path (invoices/<user_id>/YYYY-MM/)
+    return (
+        CustomerDocuments.objects.filter(customer__user=user, file=f"customers/{user.id}/{filename}").first()
+        or ReportFile.objects.filter(
+            report__customer__user=user, file__startswith=f"invoices/{user.id}/", file__endswith=f"/{filename}"
+        ).first()
+    )
+
+
+LEGACY_NAME_GONE = {
+    "error": "Download by file name is not available for staff, use /documents/<id>/download/ "
+             "or /invoices/<id>/download/."
+}
+
+
 class DownloadDocumentView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, filename):
+        if request.user.is_staff:
+            return Response(LEGACY_NAME_GONE, status=status.HTTP_410_GONE)
         try:
             filename = urlparse(filename).path.split('/')[-1]
-            # Находим документ
-            document = CustomerDocuments.objects.get(file__icontains=filename)
+            # Находим документ (чужой документ не находится, поэтому 404, а не 403)
+            document = find_document_by_name(request.user, filename)
+            if not isinstance(document, CustomerDocuments):
+                raise CustomerDocuments.DoesNotExist
             download_name = document.file.name.split("/")[-1]
 
-            # Проверка прав: владелец или админ
-            if document.customer.user != request.user and not request.user.is_staff:
-                return HttpResponse(status=403)
-
-            # Получение из minio
-            s3 = boto3.client(
-                "s3",
-                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_S3_REGION_NAME,
-            )
-            print("document.file.name:", document.file.name)
+            # Отдаём из minio: прокси, presigned-редирект или X-Accel-Redirect (DOCUMENT_DELIVERY_MODE)
             key = document.file.name  # это путь к файлу в MinIO
-            obj = s3.get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
-            response = HttpResponse(obj["Body"].read(), content_type=obj["ContentType"])
-            response["Content-Disposition"] = f'attachment; filename="{quote(download_name)}"; filename*=UTF-8\'\'{quote(download_name)}'
-            return response
+            return storage_file_response(key, download_name)
 
         except CustomerDocuments.DoesNotExist:
             raise Http404("Document not found")
@@ -179,47 +250,57 @@ class DownloadDocumentView(APIView):
 
 
 class DownloadAnyDocumentView(APIView):
+    """ Old route by file name, the frontend now uses DocumentDownloadView with the id. """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, filename):
         from urllib.parse import urlparse
+        if request.user.is_staff:
+            return Response(LEGACY_NAME_GONE, status=status.HTTP_410_GONE)
         filename = urlparse(filename).path.split('/')[-1]
 
         try:
-            # Попробовать найти файл среди customer documents
-            document = CustomerDocuments.objects.filter(file__icontains=filename).first()
+            # Ищем среди customer documents, затем среди report files
+            document = find_document_by_name(request.user, filename)
             if not document:
-                # Попробовать найти файл среди report files
-                document = ReportFile.objects.filter(file__icontains=filename).first()
-                if not document:
-                    return Response({"error": "File not found"}, status=404)
-
-            # Проверка доступа
-            if isinstance(document, CustomerDocuments):
-                is_owner = document.customer.user == request.user
-            else:  # ReportFile
-                is_owner = document.report.customer.user == request.user
-
-            if not is_owner and not request.user.is_staff:
-                return Response({"error": "Forbidden"}, status=403)
+                return Response({"error": "File not found"}, status=404)
 
             key = document.file.name
             download_name = getattr(document, 'original_name', None) or key.split("/")[-1]
 
-            s3 = boto3.client(
-                "s3",
-                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_S3_REGION_NAME,
-            )
-
-            obj = s3.get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
-            response = HttpResponse(obj["Body"].read(), content_type=obj["ContentType"])
-            response["Content-Disposition"] = f'attachment; filename="{quote(download_name)}"; filename*=UTF-8\'\'{quote(download_name)}'
-            return response
+            return storage_file_response(key, download_name)
 
         except Exception as e:
             import traceback
             traceback.print_exc()
             return Response({"error": str(e)}, status=500)
+
+
+class DocumentDownloadView(APIView):
+    """
+    Download by id: one primary key lookup joined with the owner,
+    so the cost does not grow with the number of documents.
+    model / owner_field are set in urls.py (CustomerDocuments or ReportFile).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    model = CustomerDocuments
+    owner_field = "customer__user"
+
+    def get(self, request, pk):
+        queryset = self.model.objects.filter(pk=pk)
+        if not request.user.is_staff:
+            # чужой документ для пользователя просто не существует
+            queryset = queryset.filter(**{self.owner_field: request.user})
+        document = queryset.only("id", "file").first()
+        if document is None:
+            return Response({"error": "File not found"}, status=404)
+
+        key = document.file.name
+        try:
+            return storage_file_response(key, key.split("/")[-1])
+        except ClientError as e:
+            # в режиме proxy объект читается сразу: запись есть, а файла в MinIO нет - 404
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return Response({"error": "File not found"}, status=404)
+            logger.warning(f"Download of {key} failed: {e}")
+            return Response({"error": "File storage is unavailable"}, status=502)
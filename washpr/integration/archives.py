@@ -0,0 +1,207 @@
+import queue
+import re
+import threading
+import zipfile
+from collections import deque
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from utils.downloads import ObjectBody, content_disposition
+from utils.storageminio import MinioMediaStorage, get_s3_client
+from .client import StreamingBody, get_api_client
+from .documents import DOCUMENT_URL, photo_cache_key
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Поток ZIP собирается на лету: в памяти только окно из PHOTO_ZIP_PREFETCH файлов
+# по PHOTO_ZIP_QUEUE_CHUNKS кусков, ни архив, ни отдельный файл целиком не держим
+_END = object()
+
+_storage = MinioMediaStorage()
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+class _ZipSink:
+    """
+    Write-only file for zipfile. It has no seek/tell, so zipfile writes data descriptors
+    after each member instead of going back to patch the local header.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+def open_photo_source(photo):
+    """ Iterable of the photo bytes (with close()): the MinIO mirror if present, otherwise Route Planner. """
+    if photo.cached_at:
+        try:
+            obj = get_s3_client().get_object(
+                Bucket=_storage.bucket_name, Key=photo_cache_key(photo.file_id, photo.name)
+            )
+            return ObjectBody(obj["Body"])
+        except Exception as e:
+            logger.warning(f"Photo {photo.file_id} is not in MinIO, going to Route Planner: {e}")
+
+    response = get_api_client().call_api(
+        DOCUMENT_URL, http_method="GET", params={"id": photo.file_id},
+        raw=True, stream=True, headers={"Accept-Encoding": "identity"},
+    )
+    if response is None:
+        raise RuntimeError("Route Planner did not return the file")
+    return StreamingBody(response)
+
+
+def _put(chunks, item, stop):
+    """ Blocks while the queue is full, gives up once the export was aborted. """
+    while not stop.is_set():
+        try:
+            chunks.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce(photo, chunks, stop):
+    """ Runs in a thread: reads one photo into a bounded queue, waits while the queue is full. """
+    source = None
+    try:
+        source = open_photo_source(photo)
+        for chunk in source:
+            if not _put(chunks, chunk, stop):
+                return
+        _put(chunks, _END, stop)
+    except Exception as e:
+        _put(chunks, _Failed(e), stop)
+    finally:
+        if source is not None:
+            source.close()
+
+
+def safe_name(value):
+    return re.sub(r"[^\w.-]+", "-", str(value))
+
+
+def archive_name(photo):
+    """ <contract id>/<file_id>_<name> - photos of one order land in one folder. """
+    order = photo.order
+    folder = safe_name(order.rp_contract_external_id or f"order_{order.id}")
+    return f"{folder}/{photo.file_id}_{safe_name(photo.name or photo.file_id)}"
+
+
+def stream_photos_zip(photos, prefetch=None, queue_chunks=None):
+    """
+    Generator of ZIP bytes for the photos (PhotoReport with order loaded).
+    Up to `prefetch` files are downloaded in parallel threads ahead of the one being written.
+    Photos that could not be fetched are listed in missing.txt at the end of the archive.
+    """
+    prefetch = prefetch or settings.PHOTO_ZIP_PREFETCH
+    queue_chunks = queue_chunks or settings.PHOTO_ZIP_QUEUE_CHUNKS
+    photos = iter(photos)
+    stop = threading.Event()
+    pending = deque()
+    missing = []
+
+    def start_next():
+        photo = next(photos, None)
+        if photo is None:
+            return
+        chunks = queue.Queue(maxsize=queue_chunks)
+        threading.Thread(target=_produce, args=(photo, chunks, stop), daemon=True).start()
+        pending.append((photo, chunks))
+
+    for _ in range(prefetch):
+        start_next()
+
+    sink = _ZipSink()
+    try:
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            while pending:
+                photo, chunks = pending.popleft()
+                item = chunks.get()
+                # файл, который не удалось даже начать скачивать, в архив не попадает
+                if isinstance(item, _Failed):
+                    logger.warning(f"Photo {photo.file_id} skipped in ZIP export: {item.error}")
+                    missing.append(f"{photo.file_id}\t{photo.name or ''}\t{item.error}")
+                    start_next()
+                    continue
+
+                uploaded_at = timezone.localtime(photo.uploaded_at) if photo.uploaded_at else timezone.localtime()
+                info = zipfile.ZipInfo(archive_name(photo), date_time=uploaded_at.timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                # размер заранее неизвестен, поэтому сразу ZIP64 - иначе файл > 4 ГБ сломает архив
+                with archive.open(info, mode="w", force_zip64=True) as entry:
+                    while item is not _END:
+                        if isinstance(item, _Failed):
+                            logger.warning(f"Photo {photo.file_id} is truncated in ZIP export: {item.error}")
+                            missing.append(f"{photo.file_id}\t{photo.name or ''}\ttruncated: {item.error}")
+                            break
+                        entry.write(item)
+                        yield from sink.drain()
+                        item = chunks.get()
+                start_next()
+                yield from sink.drain()
+
+            if missing:
+                archive.writestr("missing.txt", "\n".join(missing) + "\n")
+        yield from sink.drain()
+    finally:
+        # клиент оборвал скачивание - потоки перестают ждать места в очереди и закрывают источники
+        stop.set()
+
+
+def filter_photos_for_export(photos, params):
+    """
+    Narrows PhotoReport queryset by one of ?group_pair_id=, ?place=, ?report= (OrderReport id)
+    or ?month=YYYY-MM (planned date of the order). Returns (queryset, name for the file),
+    ValueError if no filter was given - the whole history is not exported in one archive.
+    """
+    if params.get("group_pair_id"):
+        value = int(params["group_pair_id"])
+        photos, label = photos.filter(order__group_pair_id=value), f"pair-{value}"
+    elif params.get("place"):
+        value = int(params["place"])
+        photos, label = photos.filter(order__place_id=value), f"place-{value}"
+    elif params.get("report"):
+        value = int(params["report"])
+        photos, label = photos.filter(order__reports__id=value), f"report-{value}"
+    elif params.get("month"):
+        # rp_time_planned - unix timestamp, месяц считаем так же, как generate_order_report
+        start = datetime.strptime(params["month"], "%Y-%m").replace(tzinfo=timezone.get_current_timezone())
+        end = start + relativedelta(months=1)
+        photos = photos.filter(
+            order__rp_time_planned__gte=int(start.timestamp()), order__rp_time_planned__lt=int(end.timestamp())
+        )
+        label = params["month"]
+    else:
+        raise ValueError("One of group_pair_id, place, report or month is required")
+    return photos.select_related("order").order_by("order_id", "id"), safe_name(label)
+
+
+def photos_zip_response(photos, download_name):
+    response = StreamingHttpResponse(stream_photos_zip(photos), content_type="application/zip")
+    response["Content-Disposition"] = content_disposition(download_name)
+    # nginx не должен буферизовать многогигабайтный ответ во временный файл
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,201 @@
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .ratelimit import RateLimiter, RateLimitExceeded
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def build_session():
+    """
+    Session with a keep-alive connection pool for the Route Planner API.
+    pool_block=True keeps the number of sockets per host within pool_maxsize,
+    extra threads wait for a free connection instead of opening new ones.
+    """
+    adapter = HTTPAdapter(
+        pool_connections=settings.ROUTE_PLANNER_POOL_CONNECTIONS,
+        pool_maxsize=settings.ROUTE_PLANNER_POOL_MAXSIZE,
+        pool_block=True,
+        max_retries=0,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Класс для работы с внешним API
+class RestApiClient:
+    def __init__(self, api_key, session=None, limiter=None):
+        self.api_key = api_key
+        self.session = session or build_session()
+        self.limiter = limiter or RateLimiter(api_key)
+        self.timeout = (
+            settings.ROUTE_PLANNER_CONNECT_TIMEOUT,
+            settings.ROUTE_PLANNER_READ_TIMEOUT,
+        )
+
+    def call_api(self, url, http_method="GET", params=None, raw=False, wait=True, stream=False, headers=None,
+                 task_name=None):
+        """
+        wait=True - sleep until the shared rate limiter gives a token (background tasks),
+        wait=False - return None at once if the API is throttled (user requests).
+        stream=True (with raw=True) - the body is not read, the caller must close the response.
+        headers - extra request headers (e.g. Range).
+        task_name - task the throttling is recorded for, when called from a worker thread.
+        """
+        try:
+            self.limiter.acquire(wait=wait, task_name=task_name)
+        except RateLimitExceeded as e:
+            print(f"Rate limit exceeded. {e}")
+            return None
+
+        request_headers = {
+            "X-API-KEY": self.api_key,
+            "accept": "*/*" if raw else "application/json"
+        }
+        request_headers.update(headers or {})
+
+        response = None
+        try:
+            response = self.session.request(
+                http_method, url, headers=request_headers, params=params, timeout=self.timeout, stream=stream
+            )
+            self.handle_headers(response)
+            response.raise_for_status()
+            if raw:
+                return response
+            else:
+                return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"Request error: {e}")
+            if stream and response is not None:
+                # возвращаем соединение в пул
+                response.close()
+            return None
+
+    def handle_headers(self, response):
+        if response.status_code == 429:
+            try:
+                retry_after = int(response.headers.get('Retry-After', 0))
+            except ValueError:
+                retry_after = 0
+            retry_after = retry_after or settings.ROUTE_PLANNER_DEFAULT_RETRY_AFTER
+            # блокируем ключ для всех воркеров, а не только для этого клиента
+            self.limiter.block_for(retry_after)
+            print(f"Rate limited. Retry after {retry_after} seconds.")
+
+    def connection_stats(self):
+        """
+        Counters of the urllib3 pools behind the session:
+        requests - requests sent, connections - sockets opened,
+        reused - requests served over an already open keep-alive connection.
+        """
+        stats = {"requests": 0, "connections": 0}
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                stats["requests"] += pool.num_requests
+                stats["connections"] += pool.num_connections
+        stats["reused"] = max(stats["requests"] - stats["connections"], 0)
+        return stats
+
+    def create_client(self, client_external_id, client_name):
+        url = "https://online.auto-gps.eu/cnt/apiItinerary/client"
+        params = {
+            "client_external_id": client_external_id,
+            "client_name": client_name
+        }
+        print("Client params:", params)
+        response = self.call_api(url, http_method="POST", params=params)
+        if response:
+            print("Client created successfully:", response)
+            return response
+        else:
+            print("Failed to create client.")
+            return None
+
+    def create_client_place(self, client_external_id, place_external_id, place_title,
+                            place_country, place_city, place_street, place_number,
+                            place_zip, contact_person_name, contact_person_phone,
+                            contact_person_email, lat, lng):
+        url = "https://online.auto-gps.eu/cnt/apiItinerary/clientPlace"
+        params = {
+            "client_external_id": client_external_id,
+            "place_external_id": place_external_id,
+            "place_title": place_title,
+            "place_country": place_country,
+            "place_city": place_city,
+            "place_street": place_street,
+            "place_number": place_number,
+            "place_zip": place_zip,
+            "contact_person_name": contact_person_name,
+            "contact_person_phone": contact_person_phone,
+            "contact_person_email": contact_person_email,
+            "lat": lat,
+            "lng": lng,
+        }
+        print("Place params:", params)
+        response = self.call_api(url, http_method="POST", params=params)
+        if response:
+            print("Place created successfully:", response)
+            return response
+        else:
+            print("Failed to create place.")
+            return None
+
+
+class StreamingBody:
+    """
+    Iterable over a stream=True response for StreamingHttpResponse.
+    Only chunk_size bytes are held in memory at a time. Django calls close()
+    when the response is finished or the client disconnects, which releases
+    the upstream connection even if iteration never started.
+    """
+
+    def __init__(self, response, chunk_size=None):
+        self.response = response
+        self.chunk_size = chunk_size or settings.ROUTE_PLANNER_STREAM_CHUNK_SIZE
+
+    def __iter__(self):
+        for chunk in self.response.iter_content(chunk_size=self.chunk_size):
+            if chunk:
+                yield chunk
+
+    def close(self):
+        self.response.close()
+
+
+_api_client = None
+_api_client_lock = threading.Lock()
+
+
+def get_api_client():
+    """
+    Returns the process-wide RestApiClient. All tasks and the photo proxy share
+    its session, so calls reuse open TCP+TLS connections to online.auto-gps.eu.
+    """
+    global _api_client
+    if _api_client is None:
+        with _api_client_lock:
+            if _api_client is None:
+                _api_client = RestApiClient(settings.EXTERNAL_API_KEY)
+    return _api_client
+
+
+def _reset_api_client():
+    # Celery prefork children must not share the parent's sockets
+    global _api_client, _api_client_lock
+    _api_client = None
+    _api_client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_api_client)
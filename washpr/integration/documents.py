@@ -0,0 +1,272 @@
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+
+import redis
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+
+from utils.downloads import ObjectBody
+from utils.storageminio import MinioMediaStorage, get_s3_client
+from .client import StreamingBody, get_api_client
+from .ratelimit import get_redis
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_URL = "https://online.auto-gps.eu/cnt/apiItinerary/document"
+
+# Кэш фото из Route Planner в MinIO: photos/<file_id>.<ext>
+PHOTO_CACHE_PREFIX = "photos"
+PHOTO_CACHE_STATS_KEY = "photocache:stats"
+# last_accessed_at обновляем не чаще раза в час, чтобы попадание в кэш не писало в базу каждый раз
+PHOTO_CACHE_TOUCH_INTERVAL = 3600
+PHOTO_CACHE_DELETE_BATCH = 1000  # максимум ключей в одном DeleteObjects
+
+_storage = MinioMediaStorage()
+
+
+def s3_client():
+    return get_s3_client()
+
+
+def photo_cache_key(file_id, name):
+    _, extension = os.path.splitext(name or "")
+    return f"{PHOTO_CACHE_PREFIX}/{file_id}{extension.lower()}"
+
+
+def quoted_etag(photo):
+    return f'"{photo.etag}"'
+
+
+def count(event, amount=1):
+    try:
+        get_redis().hincrby(PHOTO_CACHE_STATS_KEY, event, amount)
+    except redis.RedisError:
+        pass
+
+
+def cache_stats():
+    """ {"hit": .., "miss": .., "not_modified": .., "stored": .., "evicted": .., "hit_ratio": ..} """
+    try:
+        raw = get_redis().hgetall(PHOTO_CACHE_STATS_KEY)
+    except redis.RedisError:
+        return {}
+    stats = {k.decode(): int(v) for k, v in raw.items()}
+    served = stats.get("hit", 0) + stats.get("not_modified", 0)
+    requests_total = served + stats.get("miss", 0)
+    stats["hit_ratio"] = round(served / requests_total, 3) if requests_total else 0
+    return stats
+
+
+def touch(photo):
+    from order.models import PhotoReport
+
+    now = timezone.now()
+    if photo.last_accessed_at and (now - photo.last_accessed_at).total_seconds() < PHOTO_CACHE_TOUCH_INTERVAL:
+        return
+    PhotoReport.objects.filter(pk=photo.pk).update(last_accessed_at=now)
+    photo.last_accessed_at = now
+
+
+def forget(photo):
+    """ The object is gone from MinIO (deleted by hand, bucket recreated) - treat as a miss. """
+    from order.models import PhotoReport
+
+    PhotoReport.objects.filter(pk=photo.pk).update(cached_at=None, etag=None)
+    photo.cached_at = None
+    photo.etag = None
+
+
+def cached_photo_response(request, photo):
+    """
+    Response for a photo that is already in MinIO: 304 for a matching If-None-Match,
+    otherwise the object (or the requested Range of it) streamed from the bucket.
+    None if the photo is not cached, the caller then goes to Route Planner.
+    """
+    if not photo.cached_at or not photo.etag:
+        return None
+
+    etag = quoted_etag(photo)
+    cache_control = f"private, max-age={settings.PHOTO_CACHE_MAX_AGE}, immutable"
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        count("not_modified")
+        touch(photo)
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        return response
+
+    params = {"Bucket": _storage.bucket_name, "Key": photo_cache_key(photo.file_id, photo.name)}
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    # If-Range с другим ETag - клиент докачивает другую версию, отдаём файл целиком
+    if range_header and (not if_range or if_range == etag):
+        params["Range"] = range_header
+    try:
+        obj = s3_client().get_object(**params)
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("NoSuchKey", "404"):
+            forget(photo)
+        else:
+            logger.warning(f"Photo cache read failed for {photo.file_id}: {e}")
+        return None
+
+    count("hit")
+    touch(photo)
+    response = StreamingHttpResponse(
+        ObjectBody(obj["Body"]),
+        status=206 if obj.get("ContentRange") else 200,
+        content_type=obj.get("ContentType") or photo.mime or "application/octet-stream",
+    )
+    response["Content-Length"] = obj["ContentLength"]
+    if obj.get("ContentRange"):
+        response["Content-Range"] = obj["ContentRange"]
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
+
+
+def store(photo, fileobj, size, etag, content_type):
+    """ Uploads a fully received photo to MinIO and marks the row as cached. """
+    from order.models import PhotoReport
+
+    fileobj.seek(0)
+    s3_client().upload_fileobj(
+        fileobj,
+        _storage.bucket_name,
+        photo_cache_key(photo.file_id, photo.name),
+        ExtraArgs={"ContentType": content_type},
+    )
+    now = timezone.now()
+    PhotoReport.objects.filter(pk=photo.pk).update(
+        cached_at=now, size=size, etag=etag, last_accessed_at=now, mirror_status="done"
+    )
+    count("stored")
+    if settings.PHOTO_PREVIEWS_ENABLED and (content_type or "").startswith("image/"):
+        from .tasks import generate_previews_task
+        generate_previews_task.delay(photo.file_id)
+
+
+def mirror_photo(photo):
+    """
+    Downloads the photo from Route Planner straight into MinIO (no user request involved).
+    Returns False if the API did not give the file (throttled, error response).
+    """
+    response = get_api_client().call_api(
+        DOCUMENT_URL, http_method="GET", params={"id": photo.file_id},
+        raw=True, stream=True, headers={"Accept-Encoding": "identity"},
+    )
+    if response is None:
+        return False
+    content_type = response.headers.get("Content-Type", photo.mime or "application/octet-stream")
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=settings.PHOTO_CACHE_SPOOL_SIZE) as spool:
+            digest = hashlib.md5(usedforsecurity=False)
+            size = 0
+            for chunk in StreamingBody(response):
+                spool.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+            store(photo, spool, size, digest.hexdigest(), content_type)
+    finally:
+        response.close()
+    return True
+
+
+def queue_mirror(photo):
+    """
+    Cache miss served from Route Planner: the copy into MinIO is done by mirror_photo_task
+    on the "photos" worker, not by the web worker after the client already has the bytes.
+    A photo queued less than PHOTO_MIRROR_QUEUE_TIMEOUT ago is not queued again; an older
+    "queued" means the task was lost (worker killed, message dropped). Returns True if queued.
+    """
+    from order.models import PhotoReport
+
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.PHOTO_MIRROR_QUEUE_TIMEOUT)
+    queued = (
+        PhotoReport.objects.filter(pk=photo.pk)
+        .exclude(mirror_status="queued", mirror_queued_at__gte=stale)
+        .update(mirror_status="queued", mirror_queued_at=now)
+    )
+    if queued:
+        transaction.on_commit(lambda: publish_mirror(photo.file_id, now))
+    return bool(queued)
+
+
+def publish_mirror(file_id, queued_at):
+    """ Sends mirror_photo_task; if the broker refuses it, the row is not left "queued". """
+    from order.models import PhotoReport
+    from .tasks import mirror_photo_task
+
+    try:
+        mirror_photo_task.delay(file_id)
+    except Exception as e:
+        logger.warning(f"Mirror of photo {file_id} was not queued: {e}")
+        PhotoReport.objects.filter(file_id=file_id, mirror_status="queued", mirror_queued_at=queued_at).update(
+            mirror_status=None, mirror_queued_at=None
+        )
+
+
+def evict_photo_cache(max_bytes=None):
+    """
+    Size based LRU: when the cached photos with their previews take more than PHOTO_CACHE_MAX_BYTES,
+    the least recently downloaded ones are deleted until PHOTO_CACHE_EVICT_TO of the limit is left.
+    A photo is evicted together with its previews, they are regenerated when it is mirrored again.
+    """
+    from order.models import PhotoReport
+    from .previews import preview_key, preview_variants
+
+    max_bytes = settings.PHOTO_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    cached = PhotoReport.objects.filter(cached_at__isnull=False)
+    totals = cached.aggregate(
+        photos=Sum("size"), previews=Sum("previews_size", filter=Q(previews_at__isnull=False))
+    )
+    total = (totals["photos"] or 0) + (totals["previews"] or 0)
+    if total <= max_bytes:
+        return {"total": total, "evicted": 0, "freed": 0}
+
+    to_free = total - int(max_bytes * settings.PHOTO_CACHE_EVICT_TO)
+    victims = []
+    freed = 0
+    rows = cached.order_by(F("last_accessed_at").asc(nulls_first=True), "cached_at").values_list(
+        "pk", "file_id", "name", "size", "previews_at", "preview_format", "previews_size"
+    )
+    for pk, file_id, name, size, previews_at, preview_format, previews_size in rows.iterator(
+        chunk_size=PHOTO_CACHE_DELETE_BATCH
+    ):
+        keys = [photo_cache_key(file_id, name)]
+        freed += size or 0
+        if previews_at and preview_format:
+            keys += [preview_key(file_id, variant, preview_format) for variant in preview_variants()]
+            freed += previews_size or 0
+        victims.append((pk, keys))
+        if freed >= to_free:
+            break
+
+    client = s3_client()
+    # у фото до 1 + len(preview_variants()) ключей, в одном DeleteObjects - не больше PHOTO_CACHE_DELETE_BATCH
+    step = PHOTO_CACHE_DELETE_BATCH // (1 + len(preview_variants()))
+    for start in range(0, len(victims), step):
+        batch = victims[start:start + step]
+        client.delete_objects(
+            Bucket=_storage.bucket_name,
+            Delete={"Objects": [{"Key": key} for _, keys in batch for key in keys], "Quiet": True},
+        )
+        PhotoReport.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+            cached_at=None, etag=None, previews_at=None, preview_format=None, previews_size=None
+        )
+
+    count("evicted", len(victims))
+    return {"total": total - freed, "evicted": len(victims), "freed": freed}
@@ -0,0 +1,108 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# справочники вроде place_place маленькие, Seq Scan по ним нормален
+CHECKED_TABLES = ("order_order ", "order_photoreport ")
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN for the queries of the Route Planner integration and fails "
+        "if any of them reads order_order / order_photoreport with a sequential scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed", type=int, default=0,
+            help="Insert N synthetic orders and photo reports first (rolled back at the end).",
+        )
+        parser.add_argument(
+            "--allow-seqscan", action="store_true",
+            help="Keep enable_seqscan on, i.e. show the plans the planner picks for the current data.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The check needs PostgreSQL (partial indexes, EXPLAIN format).")
+
+        failed = []
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if not options["allow_seqscan"]:
+                    # на маленькой таблице планировщик и так выберет Seq Scan,
+                    # поэтому проверяем, что индекс вообще может быть использован
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            if options["seed"]:
+                self.seed(options["seed"])
+
+            for name, queryset in self.queries():
+                plan = queryset.explain()
+                seq_scans = [
+                    line.strip() for line in plan.splitlines()
+                    if any(f"Seq Scan on {table}" in line for table in CHECKED_TABLES)
+                ]
+                if seq_scans:
+                    failed.append(name)
+                    self.stdout.write(self.style.ERROR(f"[SEQ SCAN] {name}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"[OK] {name}"))
+                self.stdout.write(plan + "\n")
+
+            transaction.set_rollback(True)
+
+        if failed:
+            raise CommandError(f"Sequential scan in: {', '.join(failed)}")
+
+    def queries(self):
+        from order.models import Order, PhotoReport
+
+        external_ids = ["010325/test-1", "010325/test-2", "020325/test-3"]
+        pair_ids = [1, 2, 3]
+        return [
+            # update_orders_task / apply_contract_statuses
+            ("contracts by external id", Order.objects.filter(rp_contract_external_id__in=external_ids)),
+            ("pair partners", Order.objects.filter(
+                Q(id__in=pair_ids, pickup=True) | Q(group_pair_id__in=pair_ids, delivery=True)
+            )),
+            # check_file_in_orders_task
+            ("order by external id", Order.objects.filter(rp_contract_external_id=external_ids[0])),
+            ("photo report exists", PhotoReport.objects.filter(file_id=1)),
+            # download_file_view
+            ("photo report by file id", PhotoReport.objects.filter(file_id=1).select_related("order")),
+            # send_orders_task
+            ("pending dispatch queue", Order.objects.filter(
+                active=False, canceled=False, processed=True, created_at__lte=timezone.now()
+            ).select_related("place")),
+        ]
+
+    def seed(self, count):
+        """ Bulk inserts bypass save() hooks, so no Celery tasks are triggered. """
+        from django.contrib.auth import get_user_model
+        from customer.models import Customer
+        from order.models import Order, PhotoReport
+        from place.models import Place
+
+        user = get_user_model().objects.create(email=f"explain-seed-{timezone.now().timestamp()}@example.com")
+        customer = Customer.objects.bulk_create([Customer(user=user, company_name="Seed")])[0]
+        place = Place.objects.bulk_create([Place(
+            customer=customer, place_name="Seed", rp_city="Praha", rp_street="Seed", rp_number="1", rp_zip=11000,
+        )])[0]
+        orders = Order.objects.bulk_create([
+            Order(
+                place=place, user=user, rp_place_street="Seed", rp_place_number="1", rp_place_zip=11000,
+                rp_contract_external_id=f"seed/{i}", group_pair_id=i - i % 2 or None,
+                pickup=i % 2 == 0, delivery=i % 2 == 1,
+                active=i % 10 != 0, processed=True,
+            )
+            for i in range(count)
+        ], batch_size=1000)
+        PhotoReport.objects.bulk_create([
+            PhotoReport(order=order, file_id=-(i + 1), name=f"seed/{i}.jpg", mime="image/jpeg")
+            for i, order in enumerate(orders)
+        ], batch_size=1000)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Order._meta.db_table}")
+            cursor.execute(f"ANALYZE {PhotoReport._meta.db_table}")
+        self.stdout.write(f"Seeded {count} orders and photo reports")
@@ -0,0 +1,42 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _generate(file_id):
+    from integration.tasks import generate_previews_task
+    return generate_previews_task(file_id)
+
+
+class Command(BaseCommand):
+    help = "Generates thumbnails and previews for mirrored photos that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=1000, help="How many photos to take.")
+        parser.add_argument(
+            "--local", type=int, default=0, metavar="N",
+            help="Render here in N processes instead of queueing to the \"previews\" worker.",
+        )
+
+    def handle(self, *args, **options):
+        from order.models import PhotoReport
+        from integration.tasks import generate_previews_task
+
+        file_ids = list(
+            PhotoReport.objects.filter(
+                cached_at__isnull=False, previews_at__isnull=True, mime__startswith="image/"
+            ).order_by("-id").values_list("file_id", flat=True)[:options["limit"]]
+        )
+
+        if not options["local"]:
+            for file_id in file_ids:
+                generate_previews_task.delay(file_id)
+            self.stdout.write(f"Queued {len(file_ids)} photos")
+            return
+
+        # дочерние процессы откроют свои соединения с базой
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options["local"]) as pool:
+            for file_id, result in zip(file_ids, pool.map(_generate, file_ids)):
+                self.stdout.write(f"{file_id}: {result}")
@@ -1,3 +1,20 @@
 from django.db import models
 
-# Create your models here.
+
+class SyncCursor(models.Model):
+    """
+    Progress of an incremental sync with Route Planner (contractList, documentList).
+    synced_at - start time of the last fully committed run,
+    position - source specific watermark (e.g. newest document id seen).
+    """
+    name = models.CharField("Sync name", max_length=100, unique=True)
+    synced_at = models.DateTimeField("Synced up to", null=True, blank=True)
+    position = models.BigIntegerField("Position", default=0)
+    updated_at = models.DateTimeField("Updated at", auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} - {self.synced_at}"
+
+    class Meta:
+        verbose_name = 'Sync cursor'
+        verbose_name_plural = 'Sync cursors'
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time as ptime
+
+import redis
+from django.conf import settings
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """ Raised when a caller asked not to wait (or waited too long) for a token. """
+
+    def __init__(self, wait):
+        self.wait = wait
+        super().__init__(f"Route Planner rate limit exceeded, retry in {wait:.1f}s")
+
+
+# Token bucket: KEYS[1] - hash with tokens / ts / blocked_until.
+# ARGV: rate (tokens per second), capacity, ttl of the key.
+# Returns 0 when a token was taken, otherwise seconds to wait (as string).
+# Redis TIME is used so every worker sees the same clock.
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'blocked_until')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+local blocked_until = tonumber(state[3]) or 0
+
+if blocked_until > now then
+    return tostring(blocked_until - now)
+end
+
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return tostring(wait)
+"""
+
+# Retry-After from the API: KEYS[1] - bucket hash, ARGV[1] - seconds.
+# blocked_until only moves forward, tokens are dropped so the queue restarts slowly.
+BLOCK_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local until_ts = now + tonumber(ARGV[1])
+local current = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+if until_ts > current then
+    redis.call('HSET', KEYS[1], 'blocked_until', tostring(until_ts), 'tokens', '0', 'ts', tostring(until_ts))
+end
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[1])) + 3600)
+return tostring(until_ts - now)
+"""
+
+_redis = None
+_redis_lock = threading.Lock()
+
+
+def get_redis():
+    """ Process-wide Redis connection pool used by the integration helpers. """
+    global _redis
+    if _redis is None:
+        with _redis_lock:
+            if _redis is None:
+                _redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2)
+    return _redis
+
+
+def current_task_name():
+    """
+    Name of the Celery task running in this thread. current_task is thread-local,
+    so code that calls the API from a thread pool takes the name in the calling thread.
+    """
+    try:
+        from celery import current_task
+        return current_task.name if current_task else None
+    except Exception:
+        return None
+
+
+class RateLimiter:
+    """
+    Token bucket in Redis shared by every Celery worker and gunicorn process
+    that calls the API with the same key. A 429 seen anywhere blocks all of them.
+    """
+
+    def __init__(self, api_key, rate=None, capacity=None, max_wait=None):
+        digest = hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+        self.key = f"routeplanner:ratelimit:{digest}"
+        self.stats_key = f"{self.key}:stats"
+        self.rate = rate or settings.ROUTE_PLANNER_RATE_LIMIT
+        self.capacity = capacity or settings.ROUTE_PLANNER_RATE_BURST
+        self.max_wait = settings.ROUTE_PLANNER_RATE_MAX_WAIT if max_wait is None else max_wait
+        self._bucket = None
+        self._block = None
+
+    def _scripts(self):
+        if self._bucket is None:
+            client = get_redis()
+            self._bucket = client.register_script(TOKEN_BUCKET_SCRIPT)
+            self._block = client.register_script(BLOCK_SCRIPT)
+        return self._bucket, self._block
+
+    def try_acquire(self):
+        """ Takes a token if possible. Returns 0 or the number of seconds to wait. """
+        bucket, _ = self._scripts()
+        ttl = int(self.capacity / self.rate) + 60
+        try:
+            return float(bucket(keys=[self.key], args=[self.rate, self.capacity, ttl]))
+        except redis.RedisError as e:
+            # Без Redis не останавливаем интеграцию, просто работаем без общего лимита
+            logger.warning(f"Rate limiter unavailable, request is not throttled: {e}")
+            return 0
+
+    def acquire(self, wait=True, task_name=None):
+        """
+        Blocks until a token is available (wait=True) or raises RateLimitExceeded
+        right away (wait=False). Waiting longer than max_wait also raises.
+        task_name - for the stats, defaults to the Celery task of this thread.
+        Returns the number of seconds spent throttled.
+        """
+        task_name = task_name or current_task_name() or "web"
+        started = ptime.monotonic()
+        delay = self.try_acquire()
+        while delay > 0:
+            waited = ptime.monotonic() - started
+            if not wait or waited + delay > self.max_wait:
+                self._record(task_name, waited, rejected=True)
+                raise RateLimitExceeded(delay)
+            ptime.sleep(delay)
+            delay = self.try_acquire()
+        throttled = ptime.monotonic() - started
+        if throttled > 0.001:
+            self._record(task_name, throttled)
+        return throttled
+
+    def block_for(self, seconds):
+        """ Honours Retry-After for every process using this API key. """
+        _, block = self._scripts()
+        try:
+            block(keys=[self.key], args=[seconds])
+        except redis.RedisError as e:
+            logger.warning(f"Rate limiter unavailable, Retry-After is not shared: {e}")
+
+    def _record(self, task_name, seconds, rejected=False):
+        try:
+            pipe = get_redis().pipeline()
+            pipe.hincrbyfloat(self.stats_key, "throttled_seconds", seconds)
+            pipe.hincrbyfloat(self.stats_key, f"{task_name}:throttled_seconds", seconds)
+            pipe.hincrby(self.stats_key, "rejected" if rejected else "throttled", 1)
+            pipe.execute()
+        except redis.RedisError:
+            pass
+
+    def stats(self):
+        """
+        Time spent throttled, total and per task name
+        ({"throttled_seconds": .., "integration.tasks.send_orders_task:throttled_seconds": .., ...}).
+        """
+        try:
+            raw = get_redis().hgetall(self.stats_key)
+        except redis.RedisError:
+            return {}
+        return {k.decode(): float(v) for k, v in raw.items()}
+
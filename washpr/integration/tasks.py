@@ -1,20 +1,22 @@
 import json
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, time, timedelta, date
-import time as ptime
 
 from dateutil.relativedelta import relativedelta
-from django.core.files.base import ContentFile
 
 from django.contrib.messages import success
 
+from .client import RestApiClient, get_api_client
+from .ratelimit import current_task_name
 from .utils import get_dates_by_weekdays
 
 import requests
 from celery import shared_task
 from celery.exceptions import MaxRetriesExceededError
 from django.conf import settings
-from django.db import close_old_connections
+from django.db import close_old_connections, transaction
+from django.db.models import Q
 from django.core.mail import send_mail
 from django.utils import timezone
 
@@ -38,85 +40,6 @@ def send_contact_email_task(subject, message, from_email, recipient_list):
     return "Sending contact email"
 
 
-# Класс для работы с внешним API
-class RestApiClient:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.retry_after = None
-
-    def call_api(self, url, http_method="GET", params=None, raw=False):
-        if self.retry_after and ptime.time() < self.retry_after:
-            print("Rate limit exceeded. Please wait.")
-            return None
-
-        headers = {
-            "X-API-KEY": self.api_key,
-            "accept": "*/*" if raw else "application/json"
-        }
-
-        try:
-            response = requests.request(http_method, url, headers=headers, params=params)
-            self.handle_headers(response)
-            response.raise_for_status()
-            if raw:
-                return response
-            else:
-                return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Request error: {e}")
-            return None
-
-    def handle_headers(self, response):
-        if response.status_code == 429:
-            retry_after = int(response.headers.get('Retry-After', 0))
-            self.retry_after = ptime.time() + retry_after
-            print(f"Rate limited. Retry after {retry_after} seconds.")
-
-    def create_client(self, client_external_id, client_name):
-        url = "https://online.auto-gps.eu/cnt/apiItinerary/client"
-        params = {
-            "client_external_id": client_external_id,
-            "client_name": client_name
-        }
-        print("Client params:", params)
-        response = self.call_api(url, http_method="POST", params=params)
-        if response:
-            print("Client created successfully:", response)
-            return response
-        else:
-            print("Failed to create client.")
-            return None
-
-    def create_client_place(self, client_external_id, place_external_id, place_title,
-                            place_country, place_city, place_street, place_number,
-                            place_zip, contact_person_name, contact_person_phone,
-                            contact_person_email, lat, lng):
-        url = "https://online.auto-gps.eu/cnt/apiItinerary/clientPlace"
-        params = {
-            "client_external_id": client_external_id,
-            "place_external_id": place_external_id,
-            "place_title": place_title,
-            "place_country": place_country,
-            "place_city": place_city,
-            "place_street": place_street,
-            "place_number": place_number,
-            "place_zip": place_zip,
-            "contact_person_name": contact_person_name,
-            "contact_person_phone": contact_person_phone,
-            "contact_person_email": contact_person_email,
-            "lat": lat,
-            "lng": lng,
-        }
-        print("Place params:", params)
-        response = self.call_api(url, http_method="POST", params=params)
-        if response:
-            print("Place created successfully:", response)
-            return response
-        else:
-            print("Failed to create place.")
-            return None
-
-
 @shared_task(
     autoretry_for=(requests.exceptions.RequestException,),
     retry_kwargs={"max_retries": 5, "countdown": 180}
@@ -133,8 +56,7 @@ def create_client_task(customer_id):
     except Customer.DoesNotExist:
         return f"Customer with id {customer_id} not found."
 
-    api_key = settings.EXTERNAL_API_KEY
-    api_client = RestApiClient(api_key)
+    api_client = get_api_client()
 
     client_external_id = customer.rp_client_external_id or f"customer_{customer.pk}"
     client_name = customer.company_name
@@ -190,8 +112,7 @@ def create_place_task(place_id):
     # Предполагается, что у модели Place есть внешний ключ customer
     customer = place.customer
     if customer.active and customer.data_sent:
-        api_key = settings.EXTERNAL_API_KEY
-        api_client = RestApiClient(api_key)
+        api_client = get_api_client()
 
         client_external_id = customer.rp_client_external_id
         # place_external_id = place.place_external_id or f"place_{place.pk}"
@@ -239,8 +160,7 @@ def create_all_place_task(customer_id):
     except Place.DoesNotExist:
         return f"Place with active=Flase not found."
 
-    api_key = settings.EXTERNAL_API_KEY
-    api_client = RestApiClient(api_key)
+    api_client = get_api_client()
 
     result = []
 
@@ -299,9 +219,7 @@ def update_place_task(place_id):
         return f"Place {place_id} does not have rp_id. Nothing to update."
 
     # Инициализируем API-клиент
-    from django.conf import settings
-    api_key = settings.EXTERNAL_API_KEY
-    api_client = RestApiClient(api_key)
+    api_client = get_api_client()
 
     # Допустим, часть полей берём из place, часть — жёстко
     response = api_client.create_client_place(
@@ -327,6 +245,44 @@ def update_place_task(place_id):
         return f"Failed to update place {place_id}."
 
 
+SERVICE_ORDER_URL = "https://online.auto-gps.eu/cnt/apiItinerary/serviceOrder"
+
+# Размер пачки для bulk_create / bulk_update в задачах интеграции
+BULK_BATCH_SIZE = 200
+
+
+def dispatch_service_orders(api_client, jobs, concurrency=1):
+    """
+    Отправляет заказы в /serviceOrder, держа в работе не больше concurrency запросов.
+    jobs - список (key, payload); возвращает {key: ответ API или None}.
+    Каждый поток берёт токен из общего rate limiter, поэтому скорость ограничена лимитом API.
+    """
+    if concurrency <= 1 or len(jobs) <= 1:
+        return {
+            key: api_client.call_api(SERVICE_ORDER_URL, http_method="POST", params=payload)
+            for key, payload in jobs
+        }
+
+    responses = {}
+    # current_task в потоках пула не виден, имя задачи для статистики лимитера берём здесь
+    task_name = current_task_name()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="send-order") as executor:
+        futures = {
+            executor.submit(
+                api_client.call_api, SERVICE_ORDER_URL, http_method="POST", params=payload, task_name=task_name
+            ): key
+            for key, payload in jobs
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                responses[key] = future.result()
+            except Exception as e:
+                logger.error(f"Sending order {key} failed: {e}", exc_info=True)
+                responses[key] = None
+    return responses
+
+
 @shared_task(
     autoretry_for=(requests.exceptions.RequestException,),
     retry_kwargs={"max_retries": 5, "countdown": 180}
@@ -340,8 +296,7 @@ def send_orders_task():
     При успешном ответе (наличие поля "id" в ответе) заказ помечается как отправленный (reported=True).
     """
 
-    api_key = settings.EXTERNAL_API_KEY
-    api_client = RestApiClient(api_key)
+    api_client = get_api_client()
     # get order from route plane
     # dictionary for order external_id for each date
     orders_data_from_rp = []
@@ -381,7 +336,10 @@ def send_orders_task():
 
     # Выбираем заказы, не отправленные ранее и созданные более 35 минут назад
     time_threshold = timezone.now() - timedelta(minutes=2)
-    orders = Order.objects.filter(active=False, canceled=False, processed=True ,created_at__lte=time_threshold)
+    # place подтягиваем JOIN-ом, payload берёт place.rp_external_id, если снимок пустой
+    orders = Order.objects.filter(
+        active=False, canceled=False, processed=True, created_at__lte=time_threshold
+    ).select_related("place")
     # find out oldest order
     # min_order = min(orders, key=lambda order: order.rp_time_planned) if orders else None
     # # min time for time slice
@@ -414,6 +372,7 @@ def send_orders_task():
     #             pass
 
     results = []
+    jobs = []  # (order, contract_external_id, payload)
 
     success_get = True
     if success_get:
@@ -454,27 +413,210 @@ def send_orders_task():
                 "branch_office_id": order.rp_branch_office_id or None,
                 "problem_description": order.rp_problem_description or None,
             }
-            # URL для отправки заказа
-            url = "https://online.auto-gps.eu/cnt/apiItinerary/serviceOrder"
-            # print(f"Sending order {order.pk} with payload: {payload}")
-            response = api_client.call_api(url, http_method="POST", params=payload)
-            # print(response)
-            # response = False
-            if response and "id" in response:
-                order.active = True
-                order.rp_id = response["id"]
-                order.rp_contract_external_id = contract_external_id
-                order.contract_external_id_for_admin = contract_external_id
-                order.save(update_fields=["active", "rp_id", "rp_contract_external_id", "contract_external_id_for_admin"])
-                results.append(f"Order {order.pk} sent successfully with external id {response['id']}.")
-            else:
-                results.append(f"Failed to send order {order.pk}.")
+            jobs.append((order, contract_external_id, payload))
+
+        # Заказы уходят пачками: пачка отправляется параллельно, ответы сопоставляются
+        # с заказом по ключу, затем результаты пачки пишутся одним bulk_update.
+        # Так при падении задачи повторно уйдёт не больше одной пачки.
+        for start in range(0, len(jobs), BULK_BATCH_SIZE):
+            batch = jobs[start:start + BULK_BATCH_SIZE]
+            responses = dispatch_service_orders(
+                api_client,
+                [(order.pk, payload) for order, _, payload in batch],
+                concurrency=settings.SEND_ORDERS_CONCURRENCY,
+            )
+
+            sent_orders = []
+            for order, contract_external_id, _ in batch:
+                response = responses.get(order.pk)
+                if response and "id" in response:
+                    order.active = True
+                    order.rp_id = response["id"]
+                    order.rp_contract_external_id = contract_external_id
+                    order.contract_external_id_for_admin = contract_external_id
+                    sent_orders.append(order)
+                    results.append(f"Order {order.pk} sent successfully with external id {response['id']}.")
+                else:
+                    results.append(f"Failed to send order {order.pk}.")
+
+            with transaction.atomic():
+                Order.objects.bulk_update(
+                    sent_orders,
+                    ["active", "rp_id", "rp_contract_external_id", "contract_external_id_for_admin"],
+                    batch_size=BULK_BATCH_SIZE,
+                )
     else:
         print(f"Failed to get orders fro route plane")
     print(f"Sent {len(results)} orders. Orders: {results}")
     return results
 
 
+# Сколько главных заказов обрабатывается в одной транзакции create_orders_task
+CREATE_ORDERS_BATCH_SIZE = 100
+
+
+def place_order_data(place):
+    """ Поля rp_* заказа из точки и её клиента, те же, что заполняет Order.save. """
+    return {
+        'rp_client_external_id': place.customer.rp_client_external_id,
+        'rp_place_external_id': place.rp_external_id,
+        'rp_place_title': place.place_name,
+        'rp_place_city': place.rp_city,
+        'rp_place_street': place.rp_street,
+        'rp_place_number': place.rp_number,
+        'rp_place_zip': place.rp_zip,
+        'rp_place_email': place.rp_email,
+        'rp_place_person': place.rp_person,
+        'rp_place_phone': place.rp_phone,
+        'rp_contract_title': place.customer.company_name,
+    }
+
+
+def build_occurrence_rows(order):
+    """
+    Возвращает данные (kwargs для Order) всех заказов, которые нужно создать по главному заказу:
+    на месяц вперёд для повторяющихся или второй (delivery) для одноразовых.
+    group_pair_id у delivery, кроме первого, заполняется после резервирования id
+    (это id предыдущего pickup), поэтому здесь он остаётся None.
+    """
+    base_order_data = {
+        'place_id': order.place_id,
+        'user_id': order.user_id,
+        'group_month_id': order.group_month_id,
+        'type_ship': order.type_ship,
+        'system': order.system,
+        'monday': order.monday,
+        'tuesday': order.tuesday,
+        'wednesday': order.wednesday,
+        'thursday': order.thursday,
+        'friday': order.friday,
+        'rp_client_external_id': order.rp_client_external_id,
+        'rp_place_external_id': order.rp_place_external_id,
+        'rp_place_title': order.rp_place_title,
+        'rp_place_city': order.rp_place_city,
+        'rp_place_street': order.rp_place_street,
+        'rp_place_number': order.rp_place_number,
+        'rp_place_zip': order.rp_place_zip,
+        'rp_place_email': order.rp_place_email,
+        'rp_place_person': order.rp_place_person,
+        'rp_place_phone': order.rp_place_phone,
+        'rp_contract_title': order.rp_contract_title,
+        'rp_branch_office_id': 2263168,
+        'rp_status': 0,
+        'every_week': order.every_week,
+        'processed': True,
+    }
+    if not order.rp_client_external_id:
+        # как в Order.save: главный заказ ещё без данных Route Planner - берём их с точки
+        base_order_data.update(place_order_data(order.place))
+    rows = []
+    # заполняем отсутствующие поля пустыми строками или значениями по умолчанию.
+    if order.type_ship == 'pickup_ship_one' or order.type_ship == 'pickup_ship_dif':
+        order_date = int(datetime.combine(order.date_start_day, time()).timestamp())
+        order.rp_time_realization = order_date # date when courier to come
+        days_list = [] # days when courier has to come
+        if order.system == 'Own':
+            if order.monday:
+                days_list.append(0)
+            if order.tuesday:
+                days_list.append(1)
+            if order.wednesday:
+                days_list.append(2)
+            if order.thursday:
+                days_list.append(3)
+            if order.friday:
+                days_list.append(4)
+        elif order.system == 'Mon_Wed_Fri':
+            days_list = [0,2,4]
+        elif order.system == 'Tue_Thu':
+            days_list = [1,3]
+        elif order.system == 'Every_day':
+            days_list = [0,1,2,3,4]
+        if not days_list:
+            # get_dates_by_weekdays без дней недели никогда не закончится
+            logger.warning(f"Order {order.pk}: no weekdays for system {order.system}, nothing to create")
+            return rows
+        new_order_dates = get_dates_by_weekdays(order.date_start_day, days_list)
+        for idx, date in enumerate(new_order_dates):
+            rp_time_planned = int(datetime.combine(date, time()).timestamp()) + 43200
+            if idx % 2 == 0: # even = delivery, odd = pickup
+                base_order_data.update({
+                    'rp_time_planned': rp_time_planned,
+                    'date_start_day': date,  # для нового заказа
+                    'rp_problem_description': "delivery",
+                    'date_pickup': order.date_start_day,  # дата предыдущего заказа
+                    'date_delivery': date,             # текущая дата
+                    'delivery': True,
+                    'pickup': False,
+                    # id of main order, for next deliveries - id of previous order
+                    'group_pair_id': order.group_pair_id if idx == 0 else None,
+                })
+            else:
+                base_order_data.update({
+                    'rp_time_planned': rp_time_planned,
+                    'date_start_day': date,  # для нового заказа
+                    'rp_problem_description': "pickup",
+                    'date_pickup': date,  # текущая дата
+                    'pickup': True,
+                    'delivery': False,
+                })
+            rows.append(dict(base_order_data))
+
+    elif order.type_ship == 'one_time' or order.type_ship == 'quick_order':
+        pl_date = order.date_delivery
+        rp_time_planned = int(datetime.combine(pl_date, time()).timestamp()) + 43200
+        base_order_data.update({
+            'rp_time_planned': rp_time_planned,
+            'date_start_day': order.date_pickup,
+            'date_pickup': order.date_pickup,
+            'date_delivery': pl_date,
+            'delivery': True,
+            'pickup': False,
+            'group_pair_id': order.group_pair_id,
+            'rp_problem_description': "delivery",
+            # как в Order.save для новых одноразовых заказов
+            'group_month_id': 1 if order.type_ship == 'one_time' else 2,
+        })
+        rows.append(dict(base_order_data))
+    return rows
+
+
+def create_occurrences(masters):
+    """
+    Создаёт заказы для пачки главных заказов: сначала считает все строки,
+    затем одним запросом резервирует id и вставляет всё через bulk_create.
+    Цепочка пар: pickup ссылается сам на себя, delivery - на предыдущий pickup.
+    bulk_create не вызывает Order.save, поэтому главные заказы должны приходить
+    с select_related("place__customer") - из них заполняются поля rp_*.
+    """
+    from order.models import Order
+    from utils.sequences import reserve_ids
+
+    rows_by_master = [(order, build_occurrence_rows(order)) for order in masters]
+    ids = iter(reserve_ids(Order, sum(len(rows) for _, rows in rows_by_master)))
+
+    new_orders = []
+    for order, rows in rows_by_master:
+        previous_pk = None
+        for row in rows:
+            new_order = Order(id=next(ids), **row)
+            if new_order.pickup:
+                new_order.group_pair_id = new_order.id
+            elif new_order.group_pair_id is None:
+                new_order.group_pair_id = previous_pk
+            if not order.rp_client_external_id:
+                new_order.contract_external_id_for_admin = new_order.id
+            previous_pk = new_order.id
+            new_orders.append(new_order)
+        order.processed = True
+        order.rp_status = 0
+
+    with transaction.atomic():
+        Order.objects.bulk_create(new_orders, batch_size=BULK_BATCH_SIZE)
+        Order.objects.bulk_update(masters, ["processed", "rp_status"], batch_size=BULK_BATCH_SIZE)
+    return [new_order.id for new_order in new_orders]
+
+
 @shared_task(
     autoretry_for=(requests.exceptions.RequestException,),
     retry_kwargs={"max_retries": 5, "countdown": 180}
@@ -483,131 +625,118 @@ def create_orders_task():
     """
     Задача запускается каждый час и создает автоматически заказы на месяц или второй для одноразовых:
       - Созданы более 35 минут назад
+    Главные заказы обрабатываются пачками по CREATE_ORDERS_BATCH_SIZE, одна транзакция на пачку.
     """
     close_old_connections()
     from order.models import Order  # Импортируем модель заказа из приложения order
 
     # Выбираем заказы, не отправленные ранее и созданные более 35 минут назад
     time_threshold = timezone.now() - timedelta(minutes=1)
-    orders = Order.objects.filter(
+    orders = list(Order.objects.filter(
         processed=False,
         canceled=False,
         main_order=True,
         created_at__lte=time_threshold,
         place__deleted=False,
-    )
+    ).select_related("place__customer"))
 
     results = []
+    for start in range(0, len(orders), CREATE_ORDERS_BATCH_SIZE):
+        results.extend(create_occurrences(orders[start:start + CREATE_ORDERS_BATCH_SIZE]))
+    print(f"Created {len(results)} orders for {len(orders)} main orders")
+    return results
 
-    for order in orders:
-        base_order_data = {
-            'place': order.place,
-            'user': order.user,
-            'group_month_id': order.group_month_id,
-            'type_ship': order.type_ship,
-            'system': order.system,
-            'monday': order.monday,
-            'tuesday': order.tuesday,
-            'wednesday': order.wednesday,
-            'thursday': order.thursday,
-            'friday': order.friday,
-            'rp_client_external_id': order.rp_client_external_id,
-            'rp_place_external_id': order.rp_place_external_id,
-            'rp_place_title': order.rp_place_title,
-            'rp_place_city': order.rp_place_city,
-            'rp_place_street': order.rp_place_street,
-            'rp_place_number': order.rp_place_number,
-            'rp_place_zip': order.rp_place_zip,
-            'rp_place_email': order.rp_place_email,
-            'rp_place_person': order.rp_place_person,
-            'rp_place_phone': order.rp_place_phone,
-            'rp_contract_title': order.rp_contract_title,
-            'rp_branch_office_id': 2263168,
-            'rp_status': 0,
-            'every_week': order.every_week,
-            'processed': True,
-        }
-        # заполняем отсутствующие поля пустыми строками или значениями по умолчанию.
-        if order.type_ship == 'pickup_ship_one' or order.type_ship == 'pickup_ship_dif':
-            order_date = int(datetime.combine(order.date_start_day, time()).timestamp())
-            order.rp_time_realization = order_date # date when courier to come
-            days_list = [] # days when courier has to come
-            if order.system == 'Own':
-                if order.monday:
-                    days_list.append(0)
-                if order.tuesday:
-                    days_list.append(1)
-                if order.wednesday:
-                    days_list.append(2)
-                if order.thursday:
-                    days_list.append(3)
-                if order.friday:
-                    days_list.append(4)
-            elif order.system == 'Mon_Wed_Fri':
-                days_list = [0,2,4]
-            elif order.system == 'Tue_Thu':
-                days_list = [1,3]
-            elif order.system == 'Every_day':
-                days_list = [0,1,2,3,4]
-            new_order_dates = get_dates_by_weekdays(order.date_start_day, days_list)
-            new_order_pk = 0
-            for idx, date in enumerate(new_order_dates):
-                rp_time_planned = int(datetime.combine(date, time()).timestamp()) + 43200
-                if idx == 0:
-                    group_pair_id = order.group_pair_id # id of main order
-                else:
-                    group_pair_id = new_order_pk # id of previous order
-                if idx % 2 == 0: # even = delivery, odd = pickup
-                    base_order_data.update({
-                        'rp_time_planned': rp_time_planned,
-                        'date_start_day': date,  # для нового заказа
-                        'rp_problem_description': "delivery",
-                        'date_pickup': order.date_start_day,  # дата предыдущего заказа
-                        'date_delivery': date,             # текущая дата
-                        'delivery': True,
-                        'pickup': False,
-                        'group_pair_id': group_pair_id,
-                    })
+
+CONTRACT_LIST_URL = "https://online.auto-gps.eu/cnt/apiItinerary/contractList"
+CONTRACT_SYNC_CURSOR = "contract_list"
+CONTRACT_SYNC_PAGE_SIZE = 300
+CONTRACT_SYNC_FIRST_WINDOW = 2600000  # ~30 дней, если синхронизации ещё не было
+CONTRACT_SYNC_OVERLAP = 300  # секунд запаса на расхождение часов и долгие запуски
+CONTRACT_SYNC_MAX_PAGES = 200  # 60 000 контрактов за запуск; больше - API, скорее всего, не листает страницы
+
+
+CONTRACT_STATUS_FIELDS = ["rp_problem_description", "rp_status", "rp_time_realization"]
+
+
+def apply_contract_statuses(items, success, not_success):
+    """
+    Переносит статусы контрактов из contractList в заказы.
+    Заказы и их пары загружаются двумя запросами (по external id и по group_pair_id),
+    правила pickup/delivery применяются в памяти в порядке items, изменения пишутся bulk_update.
+      - pickup (id == group_pair_id): статус берётся из контракта; пока он не завершён
+        (COMPLETED_STATUSES), тот же статус показывается у delivery заказа пары
+      - delivery: статус обновляется, только когда pickup пары уже завершён
+    """
+    from order.models import Order
+
+    external_ids = {item["external_id"] for item in items}
+    fields = ["id", "group_pair_id", "pickup", "delivery", "rp_contract_external_id", *CONTRACT_STATUS_FIELDS]
+
+    by_id = {}
+    by_external_id = defaultdict(list)
+    for order in Order.objects.filter(rp_contract_external_id__in=external_ids).only(*fields):
+        by_id[order.id] = order
+        by_external_id[order.rp_contract_external_id].append(order)
+
+    pair_ids = {order.group_pair_id for order in by_id.values() if order.group_pair_id}
+    pickups = {}
+    deliveries = defaultdict(list)
+    if pair_ids:
+        partners = Order.objects.filter(
+            Q(id__in=pair_ids, pickup=True) | Q(group_pair_id__in=pair_ids, delivery=True)
+        ).only(*fields)
+        for partner in partners:
+            # один объект на строку, чтобы изменения были видны следующим контрактам
+            partner = by_id.setdefault(partner.id, partner)
+            if partner.pickup and partner.id in pair_ids:
+                pickups[partner.id] = partner
+            if partner.delivery:
+                deliveries[partner.group_pair_id].append(partner)
+
+    def apply(order, item):
+        order.rp_problem_description = item["problem_description"]
+        order.rp_time_realization = item["time_realization"]
+        order.rp_status = item["status"]
+        changed[order.id] = order
+
+    changed = {}
+    for item in items:
+        external_id = item["external_id"]
+        found = by_external_id.get(external_id)
+        if not found:
+            not_success.append(f"order not found for {external_id}")
+            continue
+        if len(found) > 1:
+            not_success.append(f"order error for {external_id}: several orders with this external id")
+            continue
+        order = found[0]
+
+        # if order is pickup
+        if order.id == order.group_pair_id:
+            apply(order, item)
+            success.append(f"order No {order.pk} with {external_id}")
+            # there is only second delivery order in order history and needs to show status if it's main order
+            if item["status"] not in COMPLETED_STATUSES:  # if order is done don't change second order
+                pair = deliveries.get(order.group_pair_id, [])
+                if len(pair) == 1:
+                    apply(pair[0], item)
+                    success.append(f"delivery order No {pair[0].pk} with {external_id}")
+                elif not pair:
+                    not_success.append(f"delivery order not found for group {order.group_pair_id}")
                 else:
-                    base_order_data.update({
-                        'rp_time_planned': rp_time_planned,
-                        'date_start_day': date,  # для нового заказа
-                        'rp_problem_description': "pickup",
-                        'date_pickup': date,  # текущая дата
-                        'pickup': True,
-                        'delivery': False,
-                    })
-                new_order = Order(**base_order_data)
-                new_order.save()
-                print(f"success create EVERY WEEK {new_order.pk}")
-                new_order_pk = new_order.pk
-                results.append(new_order.pk)
-
-        elif order.type_ship == 'one_time' or order.type_ship == 'quick_order':
-            pl_date = order.date_delivery
-            logger.info(f"Logger date delivery: {pl_date}. And date planned: {int(datetime.combine(pl_date, time()).timestamp())}")
-            print(f"Print date delivery: {pl_date}. And date planned: {int(datetime.combine(pl_date, time()).timestamp())}")
-            rp_time_planned = int(datetime.combine(pl_date, time()).timestamp()) + 43200
-            print(f"Print rp planned: {rp_time_planned}")
-            base_order_data.update({
-                'rp_time_planned': rp_time_planned,
-                'date_start_day': order.date_pickup,
-                'date_pickup': order.date_pickup,
-                'date_delivery': pl_date,
-                'delivery': True,
-                'pickup': False,
-                'group_pair_id': order.group_pair_id,
-                'rp_problem_description': "delivery",
-            })
-            logger.info("Logger base order data", base_order_data)
-            new_order = Order(**base_order_data)
-            new_order.save()
-            results.append(new_order.pk)
-            print(f"success create ONE TIME ORDER {new_order.pk}, rp planned - {new_order.rp_time_planned}")
-        order.processed = True
-        order.rp_status = 0
-        order.save(update_fields=["processed", "rp_status"])
-    return results
+                    not_success.append(f"delivery order error for {external_id}: several delivery orders")
+        else:
+            # if order is delivery
+            pickup_order = pickups.get(order.group_pair_id)
+            if pickup_order is None:
+                not_success.append(f"order not found for {external_id}")
+                continue
+            # if pickup order is done or cancel
+            if pickup_order.rp_status in COMPLETED_STATUSES:
+                apply(order, item)
+                success.append(f"DELIVERY order No {order.pk} with {external_id}")
+
+    Order.objects.bulk_update(changed.values(), CONTRACT_STATUS_FIELDS, batch_size=BULK_BATCH_SIZE)
 
 
 @shared_task(
@@ -616,93 +745,75 @@ def create_orders_task():
 )
 def update_orders_task():
     """
-    Update status order
+    Update status order.
+    Запрашивает только контракты, изменённые после прошлой успешной синхронизации
+    (SyncCursor "contract_list"), и проходит все страницы contractList.
+    Каждая страница применяется в своей транзакции; курсор сдвигается на время
+    начала запуска вместе с последней страницей, поэтому при ошибке посреди
+    выгрузки следующий запуск повторит то же окно (обновления идемпотентны).
+    Повтор уже виденных контрактов или больше CONTRACT_SYNC_MAX_PAGES страниц -
+    запуск останавливается так же, без сдвига курсора.
     """
-    api_key = settings.EXTERNAL_API_KEY
-    api_client = RestApiClient(api_key)
-    url = "https://online.auto-gps.eu/cnt/apiItinerary/contractList"
-    params = {
-        "show_closed": 0,
-        "last_status_change": 2600000,
-        "limit": 300,
-        "offset": 0,
-    }
-    orders_data_from_rp = [] # list for data from route plane
-    success_get = False # for ensure if request is success
-    try:
-        response = api_client.call_api(url, http_method="GET", params=params)
-        orders_data_from_rp = response
-        success_get = True
-    except requests.exceptions.RequestException as e:
-        print("API Request failed:", e)
-
-    if success_get: # request is success
-        if orders_data_from_rp: # list with data is not empty
-            close_old_connections()
-            from order.models import Order
-            success =[]
-            not_success = []
-            for item in orders_data_from_rp:
-                external_id = item["external_id"]
-                # for main order and pick up order
-                main_order = None
-                try:
-                    order = Order.objects.get(rp_contract_external_id=external_id)
-                    # if order is pickup
-                    if order.id == order.group_pair_id:
-                        # logger.info(f"main external_id: {external_id}")
-                        order.rp_problem_description = item["problem_description"]
-                        order.rp_time_realization = item["time_realization"]
-                        order.rp_status = item["status"]
-                        order.save(update_fields=["rp_problem_description", "rp_status", "rp_time_realization"])
-                        success.append(f"order No {order.pk} with {external_id}")
-                        main_order = order
-                    else:
-                        try:
-                            # if order is delivery
-                            pickup_order = Order.objects.get(id=order.group_pair_id, pickup=True)
-                            print(f"!!!!! pickup order {pickup_order.id} AND order delivery {order.id}")
-                            print(f"STATUS pickup order: {pickup_order.rp_status}")
-                            # if pickup order is done or cancel
-                            if pickup_order.rp_status in COMPLETED_STATUSES:
-                                order.rp_problem_description = item["problem_description"]
-                                order.rp_time_realization = item["time_realization"]
-                                order.rp_status = item["status"]
-                                order.save(update_fields=["rp_problem_description", "rp_status", "rp_time_realization"])
-                                success.append(f"DELIVERY order No {order.pk} with {external_id}")
-                        except Order.DoesNotExist:
-                            not_success.append(f"order not found for {external_id}")
-                            continue
-                        except Exception as e:
-                            not_success.append(f"order error for {external_id}: {str(e)}")
-                            continue
-                except Order.DoesNotExist:
-                    not_success.append(f"order not found for {external_id}")
-                    continue
-                except Exception as e:
-                    not_success.append(f"order error for {external_id}: {str(e)}")
-                    continue
-                # there is only second delivery order in order history and needs to show status if it's main order
-                if main_order and item["status"] not in COMPLETED_STATUSES: # if order is done don't change second order
-                    try:
-                        delivery_order = Order.objects.get(group_pair_id=main_order.group_pair_id, delivery=True)
-                        # logger.info(f"delivery_order: {delivery_order.rp_contract_external_id}")
-                        delivery_order.rp_problem_description = item["problem_description"]
-                        delivery_order.rp_time_realization = item["time_realization"]
-                        delivery_order.rp_status = item["status"]
-                        delivery_order.save(update_fields=["rp_problem_description", "rp_status", "rp_time_realization"])
-                        success.append(f"delivery order No {delivery_order.pk} with {external_id}")
-                    except Order.DoesNotExist:
-                        not_success.append(f"delivery order not found for group {main_order.group_pair_id}")
-                    except Exception as e:
-                        not_success.append(f"delivery order error for {external_id}: {str(e)}")
-
-            return {"success": success, "not_success": not_success}
+    api_client = get_api_client()
+    close_old_connections()
+    from .models import SyncCursor
 
-        else:
-            return "order_data_from_rp is empty"
+    cursor, _ = SyncCursor.objects.get_or_create(name=CONTRACT_SYNC_CURSOR)
+    run_started = timezone.now()
+    if cursor.synced_at:
+        # last_status_change - окно в секундах назад от текущего момента
+        window = int((run_started - cursor.synced_at).total_seconds()) + CONTRACT_SYNC_OVERLAP
     else:
-        return "Request doesn't work"
+        window = CONTRACT_SYNC_FIRST_WINDOW
+
+    success = []
+    not_success = []
+    offset = 0
+    pages = 0
+    seen = set()
+    while True:
+        params = {
+            "show_closed": 0,
+            "last_status_change": window,
+            "limit": CONTRACT_SYNC_PAGE_SIZE,
+            "offset": offset,
+        }
+        page = api_client.call_api(CONTRACT_LIST_URL, http_method="GET", params=params)
+        if page is None:
+            # курсор не двигаем, следующий запуск начнёт с того же места
+            return {"error": "Request doesn't work", "pages": pages, "success": success, "not_success": not_success}
+
+        # API, который не учитывает offset, отдаёт ту же страницу снова - без этой проверки цикл не кончится
+        page_ids = {item.get("external_id") for item in page}
+        if page and page_ids <= seen:
+            logger.warning(f"contractList returned only already seen contracts at offset {offset}, stopping")
+            return {"error": "Pages repeat", "pages": pages, "success": success, "not_success": not_success}
+        seen |= page_ids
+
+        is_last_page = len(page) < CONTRACT_SYNC_PAGE_SIZE
+        with transaction.atomic():
+            apply_contract_statuses(page, success, not_success)
+            if is_last_page:
+                cursor.synced_at = run_started
+                cursor.save(update_fields=["synced_at", "updated_at"])
+        pages += 1
+        if is_last_page:
+            break
+        if pages >= CONTRACT_SYNC_MAX_PAGES:
+            # курсор не двигаем: следующий запуск повторит окно, обновления идемпотентны
+            logger.warning(f"contractList has more than {CONTRACT_SYNC_MAX_PAGES} pages, stopping")
+            return {"error": "Too many pages", "pages": pages, "success": success, "not_success": not_success}
+        offset += CONTRACT_SYNC_PAGE_SIZE
+
+    if not success and not not_success:
+        return "order_data_from_rp is empty"
+    return {"success": success, "not_success": not_success, "pages": pages}
+
+
+DOCUMENT_LIST_URL = "https://online.auto-gps.eu/cnt/apiItinerary/documentList"
+DOCUMENT_SYNC_CURSOR = "document_list"
+DOCUMENT_SYNC_FIRST_WINDOW = timedelta(days=30)  # если синхронизации ещё не было
+DOCUMENT_SYNC_OVERLAP = timedelta(days=2)  # фото к старым контрактам могут загрузить с опозданием
 
 
 @shared_task(
@@ -711,99 +822,184 @@ def update_orders_task():
 )
 def check_file_in_orders_task():
     """
-    Check if file exists in order
+    Check if file exists in order.
+    SyncCursor "document_list" хранит время прошлого успешного запуска и id самого
+    нового уже обработанного документа (id документов в Route Planner растут).
+    Документы с id не больше этого водяного знака отбрасываются ещё до запросов в базу,
+    документ без заказа держит водяной знак, пока не выйдет из окна запроса,
+    заказы находятся одним IN-запросом, новые PhotoReport вставляются одним bulk_create.
     """
-    now = datetime.now()
-    # 30 дней назад
-    past_period = now - timedelta(days=30)
-    # Два дня вперед
-    two_days_ahead = now + timedelta(days=2)
-    # Перевод в Unix timestamp (целое число секунд с 1 января 1970 года)
-    timestamp_past_period = int(past_period.timestamp())
-    timestamp_two_days_ahead = int(two_days_ahead.timestamp())
-
-    api_key = settings.EXTERNAL_API_KEY
-    api_client = RestApiClient(api_key)
-    url = "https://online.auto-gps.eu/cnt/apiItinerary/documentList"
-    params = {
-        "dateTimeFrom": timestamp_past_period,
-        "dateTimeTo": timestamp_two_days_ahead,
-    }
-    data_from_rp = [] # list for data from route plane
-    try:
-        response = api_client.call_api(url, http_method="GET", params=params)
-        data_from_rp = response
-    except requests.exceptions.RequestException as e:
-        print("API Request failed:", e)
-
-    # Если данных нет, возвращаем соответствующее сообщение
-    if not data_from_rp:
-        return "order_data_from_rp is empty"
-
     close_old_connections()
     from order.models import Order, PhotoReport
-    result = []
-    for item in data_from_rp[0]:
-        external_id = item.get("contractId")
-        item_id = item.get("id")
-        # Допустим, ещё есть поля name, mime и т.д.
-        name = item.get("name")
-        mime = item.get("mime")
-
-        if not external_id or not item_id:
-            # Если у нас нет contractId или id, то пропускаем
-            continue
+    from utils.sequences import reserve_ids
+    from .models import SyncCursor
 
-        try:
-            order = Order.objects.get(rp_contract_external_id=external_id)
-        except Order.DoesNotExist:
-            # print(f"Order с rp_contract_external_id={external_id} не найден.")
-            continue
+    cursor, _ = SyncCursor.objects.get_or_create(name=DOCUMENT_SYNC_CURSOR)
+    now = timezone.now()
+    if cursor.synced_at:
+        date_from = cursor.synced_at - DOCUMENT_SYNC_OVERLAP
+    else:
+        date_from = now - DOCUMENT_SYNC_FIRST_WINDOW
+    # Два дня вперед
+    date_to = now + timedelta(days=2)
 
-        # Проверяем, есть ли уже такой file_id
-        if not PhotoReport.objects.filter(file_id=item_id).exists():
-            # Если не существует, то создаём
-            PhotoReport.objects.create(
-                order=order,
-                file_id=item_id,
-                name=name,
-                mime=mime,
-            )
-            print(f"PhotoReport создан: file_id={item_id}")
-            result.append(item_id)
-        else:
-            pass
+    api_client = get_api_client()
+    params = {
+        # Перевод в Unix timestamp (целое число секунд с 1 января 1970 года)
+        "dateTimeFrom": int(date_from.timestamp()),
+        "dateTimeTo": int(date_to.timestamp()),
+    }
+    data_from_rp = api_client.call_api(DOCUMENT_LIST_URL, http_method="GET", params=params)
+    if data_from_rp is None:
+        # запрос не удался, водяной знак не двигаем
+        return "Request doesn't work"
 
+    items = [
+        {**item, "id": int(item["id"])}
+        for item in (data_from_rp[0] if data_from_rp else [])
+        # Если у нас нет contractId или id, то пропускаем
+        if item.get("contractId") and item.get("id")
+    ]
+    new_items = [item for item in items if item["id"] > cursor.position]
+
+    order_ids = dict(
+        Order.objects.filter(
+            rp_contract_external_id__in={item["contractId"] for item in new_items}
+        ).values_list("rp_contract_external_id", "id")
+    ) if new_items else {}
+    existing = set(
+        PhotoReport.objects.filter(
+            file_id__in=[item["id"] for item in new_items]
+        ).values_list("file_id", flat=True)
+    ) if new_items else set()
+
+    # Фото может прийти раньше, чем contractId записан в заказ: водяной знак останавливаем
+    # перед первым таким документом, и следующие запуски видят его снова, пока он в окне запроса
+    unmatched = [item["id"] for item in new_items if item["contractId"] not in order_ids]
+    if unmatched:
+        watermark = min(unmatched) - 1
+    else:
+        watermark = max([cursor.position] + [item["id"] for item in new_items])
+
+    new_reports = [
+        item for item in new_items
+        if item["contractId"] in order_ids and item["id"] not in existing
+    ]
+    # pk берём из sequence заранее: по ним видно, какие строки вставлены на самом деле,
+    # а какие ignore_conflicts пропустил (их уже создал параллельный запуск)
+    pks = reserve_ids(PhotoReport, len(new_reports))
+    reports = [
+        PhotoReport(
+            pk=pk,
+            order_id=order_ids[item["contractId"]],
+            file_id=item["id"],
+            name=item.get("name"),
+            mime=item.get("mime"),
+        )
+        for pk, item in zip(pks, new_reports)
+    ]
+
+    with transaction.atomic():
+        # unique file_id + ignore_conflicts: параллельный запуск не создаст дублей
+        PhotoReport.objects.bulk_create(reports, ignore_conflicts=True, batch_size=BULK_BATCH_SIZE)
+        result = list(PhotoReport.objects.filter(pk__in=pks).values_list("file_id", flat=True)) if pks else []
+        cursor.synced_at = now
+        cursor.position = watermark
+        cursor.save(update_fields=["synced_at", "position", "updated_at"])
+
+    if result:
+        print(f"PhotoReport создан: file_id={result}")
+        if settings.PHOTO_MIRROR_ENABLED:
+            from .documents import publish_mirror
+            queued_at = timezone.now()
+            PhotoReport.objects.filter(file_id__in=result, cached_at__isnull=True).update(
+                mirror_status="queued", mirror_queued_at=queued_at
+            )
+            for file_id in result:
+                publish_mirror(file_id, queued_at)
     return result
 
 
-@shared_task(
-    autoretry_for=(requests.exceptions.RequestException,),
-    retry_kwargs={"max_retries": 5, "countdown": 180}
-)
-def download_file_from_external_api(file_id):
+@shared_task(bind=True, max_retries=settings.PHOTO_MIRROR_MAX_RETRIES, queue="photos")
+def mirror_photo_task(self, file_id):
     """
-    Запрашивает файл с внешнего API и сохраняет его в базе данных.
+    Copies a newly discovered photo from Route Planner into the MinIO cache,
+    so the user download is a read from our bucket (integration.documents).
+    Runs on the "photos" queue with its own worker and concurrency; retries with
+    growing delays and marks the row as failed once the retry budget is spent.
     """
-    url = "https://online.auto-gps.eu/cnt/apiItinerary/document"
-    api_key = settings.EXTERNAL_API_KEY
-    api_client = RestApiClient(api_key)
-    params = {
-        "id": file_id,
-    }
+    from django.db.models import F
+    from order.models import PhotoReport
+    from .documents import mirror_photo
+
+    photo = PhotoReport.objects.filter(file_id=file_id).first()
+    if photo is None:
+        return f"PhotoReport {file_id} not found"
+    if photo.cached_at:
+        # уже скачали (например, пользователь открыл фото раньше)
+        PhotoReport.objects.filter(pk=photo.pk).update(mirror_status="done")
+        return f"File {file_id} is already cached"
+
+    # каждая попытка обновляет mirror_queued_at: задача с ретраями не считается потерянной (queue_mirror)
+    PhotoReport.objects.filter(pk=photo.pk).update(
+        mirror_attempts=F("mirror_attempts") + 1, mirror_queued_at=timezone.now()
+    )
     try:
-        from order.models import PhotoReport
-        response = api_client.call_api(url, http_method="GET", params=params)
-        response.raise_for_status()
-
-        # Создание объекта PhotoReport
-        photo_report = PhotoReport.objects.create(file_id=file_id)
-        photo_report.file.save(f"{file_id}.jpg", ContentFile(response.content), save=True)
-
-        return f"File {file_id} downloaded successfully."
+        mirrored = mirror_photo(photo)
+        error = "Route Planner did not return the file"
+    except Exception as e:
+        mirrored = False
+        error = str(e)
+    if mirrored:
+        return f"File {file_id} mirrored"
+
+    if self.request.retries >= self.max_retries:
+        PhotoReport.objects.filter(pk=photo.pk).update(mirror_status="failed")
+        logger.warning(f"Mirror of photo {file_id} failed: {error}")
+        return f"Failed to mirror file {file_id}: {error}"
+    raise self.retry(countdown=settings.PHOTO_MIRROR_RETRY_DELAY * 2 ** self.request.retries)
+
+
+@shared_task(bind=True, max_retries=3, queue="previews")
+def generate_previews_task(self, file_id):
+    """
+    Renders the thumbnail and preview of a mirrored photo and stores them in MinIO.
+    Resizing is CPU-bound, so the "previews" queue has its own prefork worker:
+    its processes are the process pool, one photo per process at a time.
+    """
+    from botocore.exceptions import BotoCoreError, ClientError
+    from PIL import UnidentifiedImageError
+    from order.models import PhotoReport
+    from .previews import generate_previews
+
+    photo = PhotoReport.objects.filter(file_id=file_id).first()
+    if photo is None:
+        return f"PhotoReport {file_id} not found"
+    if photo.previews_at:
+        return f"Previews for {file_id} already exist"
+    if not photo.cached_at:
+        # оригинала в MinIO нет (вытеснен или ещё не скопирован), превью сделаем после зеркалирования
+        return f"File {file_id} is not mirrored"
 
-    except requests.exceptions.RequestException as e:
-        return f"Failed to download file {file_id}: {str(e)}"
+    try:
+        sizes = generate_previews(photo)
+    except UnidentifiedImageError:
+        return f"File {file_id} is not an image"
+    except (BotoCoreError, ClientError) as e:
+        raise self.retry(exc=e, countdown=60)
+    return {"file_id": file_id, "sizes": sizes}
+
+
+@shared_task
+def evict_photo_cache_task():
+    """ Keeps the MinIO photo cache under PHOTO_CACHE_MAX_BYTES. """
+    from .documents import cache_stats, evict_photo_cache
+
+    result = evict_photo_cache()
+    if result["evicted"]:
+        print(f"Photo cache: evicted {result['evicted']} files, {result['freed']} bytes")
+    result["stats"] = cache_stats()
+    return result
 
 
 @shared_task(
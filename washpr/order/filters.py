@@ -0,0 +1,60 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+# Фильтры истории заказов из query params - вместо фильтрации всего списка в браузере:
+#   ?place=3,5            точки
+#   ?status=2,3           rp_status
+#   ?type_ship=one_time   тип заказа (через запятую)
+#   ?pickup=true / ?delivery=true
+#   ?canceled=false
+#   ?history=true         без действующих повторяющихся заказов (every_week и не end_order)
+#   ?date_from=2025-03-01&date_to=2025-03-31   по rp_time_planned, включительно
+BOOLEAN_FILTERS = ("pickup", "delivery", "canceled")
+
+
+def _int_list(value, name):
+    try:
+        return [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise ValueError(f"{name} must be a comma separated list of numbers")
+
+
+def _boolean(value, name):
+    if value.lower() in ("1", "true", "yes"):
+        return True
+    if value.lower() in ("0", "false", "no"):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+
+def _timestamp(value, name, end_of_day=False):
+    try:
+        day = datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"{name} must be YYYY-MM-DD")
+    if end_of_day:
+        day += timedelta(days=1)
+    # rp_time_planned - unix timestamp, границы дня считаем в часовом поясе проекта
+    return int(datetime.combine(day, time(), tzinfo=timezone.get_current_timezone()).timestamp())
+
+
+def filter_orders(orders, params):
+    """ Applies the filters above to an Order queryset. ValueError for a malformed value. """
+    if params.get("place"):
+        orders = orders.filter(place_id__in=_int_list(params["place"], "place"))
+    if params.get("status"):
+        orders = orders.filter(rp_status__in=_int_list(params["status"], "status"))
+    if params.get("type_ship"):
+        orders = orders.filter(type_ship__in=[item for item in params["type_ship"].split(",") if item])
+    for name in BOOLEAN_FILTERS:
+        if params.get(name):
+            orders = orders.filter(**{name: _boolean(params[name], name)})
+    if params.get("history") and _boolean(params["history"], "history"):
+        orders = orders.exclude(Q(every_week=True, end_order=False))
+    if params.get("date_from"):
+        orders = orders.filter(rp_time_planned__gte=_timestamp(params["date_from"], "date_from"))
+    if params.get("date_to"):
+        orders = orders.filter(rp_time_planned__lt=_timestamp(params["date_to"], "date_to", end_of_day=True))
+    return orders
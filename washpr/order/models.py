@@ -4,6 +4,7 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from customer.models import Customer
 from place.models import Place
+from utils.sequences import reserve_ids
 from utils.storageminio import MinioMediaStorage
 
 User = get_user_model()
@@ -26,7 +27,7 @@ class Order(models.Model):
     place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name="order_place")
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders", db_index=True, null=True, blank=True)
     group_month_id = models.IntegerField("Group monthly order ID", db_index=True, null=True, blank=True)
-    group_pair_id = models.IntegerField("Group pair order ID", db_index=True, null=True, blank=True)
+    group_pair_id = models.IntegerField("Group pair order ID", null=True, blank=True)
     choice_type_ship = [
         ('pickup_ship_one', 'clear for durty'),
         ('pickup_ship_dif', '1 day clear, 3th day durty'),
@@ -96,9 +97,10 @@ class Order(models.Model):
     def save(self, *args, **kwargs):
         is_new = not self.pk
         if is_new:
-            # Сохраняем новый объект с active=False (по умолчанию не отправлено)
+            # id берём из sequence заранее, чтобы поля, зависящие от pk,
+            # попали в тот же INSERT (без второго UPDATE)
             # в views.py тоже есть заполняемые поля
-            super().save(*args, **kwargs)
+            self.pk = reserve_ids(Order, 1)[0]
             if self.type_ship == 'pickup_ship_one' or self.type_ship == 'pickup_ship_dif':
                 self.rp_time_planned = int(datetime.combine(self.date_start_day, time()).timestamp()) + 43200
             if self.type_ship == 'one_time' or self.type_ship == 'quick_order':
@@ -135,26 +137,8 @@ class Order(models.Model):
                 if self.pickup == True and self.delivery == False:
                     self.group_pair_id = self.pk
 
-            super().save(update_fields=[
-                'rp_client_external_id',
-                'rp_place_external_id',
-                'rp_place_title',
-                'rp_place_city',
-                'rp_place_street',
-                'rp_place_number',
-                'rp_place_zip',
-                'rp_place_email',
-                'rp_place_person',
-                'rp_place_phone',
-                'rp_contract_title',
-                'rp_time_planned',
-                'main_order',
-                'pickup',
-                'group_month_id',
-                'group_pair_id',
-                'rp_branch_office_id',
-                'rp_problem_description',
-            ])
+            kwargs["force_insert"] = True
+            super().save(*args, **kwargs)
             return
 
         super().save(*args, **kwargs)
@@ -167,7 +151,28 @@ class Order(models.Model):
         verbose_name_plural = 'Orders'
         indexes = [
             models.Index(fields=["reported"]),  # Ускоряет поиск невключенных заказов
-            models.Index(fields=["user", "created_at"])  # Оптимизация фильтрации по пользователю
+            models.Index(fields=["user", "created_at"]),  # Оптимизация фильтрации по пользователю
+            # история заказов точки постранично (OrderHistoryPagination): place_id=... ORDER BY created_at DESC
+            models.Index(fields=["place", "created_at"], name="order_place_created_idx"),
+            # фильтры истории (order.filters): статус и период у заказов пользователя;
+            # type_ship / pickup / delivery малоселективны и проверяются уже по найденным строкам
+            models.Index(fields=["user", "rp_status", "created_at"], name="order_user_status_idx"),
+            models.Index(fields=["user", "rp_time_planned"], name="order_user_planned_idx"),
+            # пары pickup/delivery: group_pair_id=..., delivery=True (заменяет индекс по group_pair_id)
+            models.Index(fields=["group_pair_id", "delivery"], name="order_pair_delivery_idx"),
+            # очередь send_orders_task: только ещё не отправленные заказы
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(active=False, canceled=False, processed=True),
+                name="order_pending_dispatch_idx",
+            ),
+            # update_orders_task / check_file_in_orders_task ищут заказ по id контракта в Route Planner.
+            # Не unique: в старых данных бывают повторы, apply_contract_statuses их пропускает с ошибкой
+            models.Index(
+                fields=["rp_contract_external_id"],
+                condition=models.Q(rp_contract_external_id__isnull=False),
+                name="order_rp_contract_external_idx",
+            ),
         ]
 
 
@@ -186,7 +191,7 @@ class OrderReport(models.Model):
 
 class ReportFile(models.Model):
     report = models.ForeignKey(OrderReport, on_delete=models.CASCADE, related_name="files")
-    file = models.FileField(storage=MinioMediaStorage(), upload_to=report_file_path)
+    file = models.FileField(storage=MinioMediaStorage(), upload_to=report_file_path, db_index=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -199,10 +204,28 @@ class ReportFile(models.Model):
 
 class PhotoReport(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="photo_reports")
-    file_id = models.IntegerField("File ID")
+    file_id = models.IntegerField("File ID", unique=True)
     name = models.CharField("File name", max_length=250, blank=True, null=True)
     mime = models.CharField("File mime", max_length=250, blank=True, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Копия файла в MinIO (integration.documents), cached_at=None - в кэше нет
+    cached_at = models.DateTimeField("Cached in MinIO at", blank=True, null=True)
+    size = models.BigIntegerField("File size", blank=True, null=True)
+    etag = models.CharField("ETag", max_length=64, blank=True, null=True)
+    last_accessed_at = models.DateTimeField("Last downloaded at", blank=True, null=True)
+    # Фоновое зеркалирование в MinIO (integration.tasks.mirror_photo_task)
+    choice_mirror_status = [
+        ('queued', 'Queued'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    mirror_status = models.CharField("Mirror status", max_length=20, blank=True, null=True, choices=choice_mirror_status)
+    mirror_attempts = models.PositiveSmallIntegerField("Mirror attempts", default=0)
+    mirror_queued_at = models.DateTimeField("Mirror queued at", blank=True, null=True)
+    # Уменьшенные копии для галереи (integration.previews)
+    previews_at = models.DateTimeField("Previews generated at", blank=True, null=True)
+    preview_format = models.CharField("Preview format", max_length=10, blank=True, null=True)
+    previews_size = models.BigIntegerField("Previews size", blank=True, null=True)
 
     def __str__(self):
         return f"File {self.file_id} for order {self.order.rp_contract_external_id}"
@@ -210,3 +233,11 @@ class PhotoReport(models.Model):
     class Meta:
         verbose_name = 'Photo report'
         verbose_name_plural = 'Photo reports'
+        indexes = [
+            # LRU-вытеснение кэша: самые давно скачанные из закэшированных
+            models.Index(
+                fields=["last_accessed_at"],
+                condition=models.Q(cached_at__isnull=False),
+                name="photoreport_cache_lru_idx",
+            ),
+        ]
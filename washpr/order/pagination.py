@@ -0,0 +1,118 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination, newest first, on (key_field, id) - or on id alone when key_field is None.
+
+    The cursor is the key of the last row of the page, the next page is WHERE (key_field, id) < cursor,
+    so the index is read from that point and page 100 costs the same as page 1 (no OFFSET).
+
+    Opt-in: only used when the request has ?cursor= or ?page_size=, otherwise the views
+    return the whole list as before.
+    """
+    key_field = None
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def is_requested(self, request):
+        return self.cursor_query_param in request.query_params or self.page_size_query_param in request.query_params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, row):
+        raw = str(row.id)
+        if self.key_field:
+            raw = f"{getattr(row, self.key_field).isoformat()}|{raw}"
+        return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            if not self.key_field:
+                return None, int(raw)
+            key, pk = raw.split("|")
+            return datetime.fromisoformat(key), int(pk)
+        except (Base64Error, UnicodeDecodeError, ValueError):
+            raise NotFound("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if self.key_field:
+            queryset = queryset.order_by(f"-{self.key_field}", "-id")
+        else:
+            queryset = queryset.order_by("-id")
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            key, pk = self.decode_cursor(cursor)
+            if self.key_field:
+                queryset = queryset.filter(
+                    Q(**{f"{self.key_field}__lt": key}) | Q(**{self.key_field: key, "id__lt": pk})
+                )
+            else:
+                queryset = queryset.filter(id__lt=pk)
+
+        # одна лишняя строка показывает, есть ли следующая страница
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+
+class OrderHistoryPagination(KeysetPagination):
+    """ Order history on (created_at, id), uses the (user, created_at) and (place, created_at) indexes. """
+    key_field = "created_at"
+
+
+class PhotoReportPagination(KeysetPagination):
+    """ Photos newest first by id - rows are inserted in upload order. """
+    page_size = 100
+    max_page_size = 500
+
+
+class PhotoGroupPagination(KeysetPagination):
+    """ Photo groups (order.views.photo_groups) newest pair first, keyed by the "pair" annotation. """
+    page_size = 20
+    max_page_size = 100
+
+    def encode_cursor(self, row):
+        return urlsafe_b64encode(str(row["pair"]).encode()).decode().rstrip("=")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by("-pair")
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            _, pair = self.decode_cursor(cursor)
+            queryset = queryset.filter(pair__lt=pair)
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
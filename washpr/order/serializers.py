@@ -1,5 +1,10 @@
+from types import SimpleNamespace
+
+from django.utils.dateparse import parse_datetime
 from rest_framework import serializers
 from .models import Order, ReportFile, OrderReport, PhotoReport
+from integration import previews
+from utils.fields import CachedFileUrlsMixin
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -36,6 +41,7 @@ class OrderSerializer(serializers.ModelSerializer):
 
 
 class GetOrderSerializer(serializers.ModelSerializer):
+    # place должен быть подгружен select_related('place'), иначе +1 запрос на каждый заказ
     place_name = serializers.CharField(source='place.place_name', read_only=True)
     class Meta:
         model = Order
@@ -50,11 +56,52 @@ class GetOrderSerializer(serializers.ModelSerializer):
 
 
 class PhotoReportSerializer(serializers.ModelSerializer):
-    order_id = serializers.IntegerField(source='order.id', read_only=True)
+    order_id = serializers.IntegerField(read_only=True)
+    # order подгружается select_related("order"), иначе +1 запрос на каждое фото
     group_pair_id = serializers.IntegerField(source='order.group_pair_id', read_only=True)
+    # ссылки на уменьшенные копии в MinIO, null - ещё не готовы (тогда качаем оригинал)
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
+
     class Meta:
         model = PhotoReport
-        fields = ["id", "order_id", "file_id", "group_pair_id", "mime", "uploaded_at"]
+        fields = ["id", "order_id", "file_id", "group_pair_id", "mime", "uploaded_at", "thumbnail_url", "preview_url"]
+
+    def get_thumbnail_url(self, obj):
+        return previews.preview_url(obj, "thumb")
+
+    def get_preview_url(self, obj):
+        return previews.preview_url(obj, "preview")
+
+
+class PhotoGroupSerializer(serializers.Serializer):
+    """
+    One pickup/delivery pair with its photos, from the rows of order.views.photo_groups.
+    group_pair_id is the order id for orders without a pair.
+    """
+    group_pair_id = serializers.IntegerField(source="pair")
+    order_ids = serializers.SerializerMethodField()
+    uploaded_at = serializers.DateTimeField(source="last_uploaded_at")
+    photos = serializers.SerializerMethodField()
+
+    def get_order_ids(self, group):
+        return sorted(group["order_ids"])
+
+    def get_photos(self, group):
+        photos = []
+        for data in group["photos"]:
+            photo = SimpleNamespace(**data)
+            photos.append({
+                "id": photo.id,
+                "order_id": photo.order_id,
+                "file_id": photo.file_id,
+                "group_pair_id": group["pair"],
+                "mime": photo.mime,
+                "uploaded_at": serializers.DateTimeField().to_representation(parse_datetime(photo.uploaded_at)),
+                "thumbnail_url": previews.preview_url(photo, "thumb"),
+                "preview_url": previews.preview_url(photo, "preview"),
+            })
+        return photos
 
 
 class DownloadPhotoReportSerializer(serializers.ModelSerializer):
@@ -63,12 +110,16 @@ class DownloadPhotoReportSerializer(serializers.ModelSerializer):
         fields = ["file_id", "name", "mime"]
 
 
-class ReportFileSerializer(serializers.ModelSerializer):
+class ReportFileSerializer(CachedFileUrlsMixin, serializers.ModelSerializer):
     class Meta:
         model = ReportFile
         fields = ["id", "file", "uploaded_at"]
 
 class OrderReportSerializer(serializers.ModelSerializer):
+    """
+    Список id заказов ("orders") выводится только с context["include_orders"] - у отчёта их сотни.
+    Для списков queryset готовит order.views.report_list_queryset (files, orders_count одним запросом).
+    """
     files = ReportFileSerializer(many=True, read_only=True)  # Fetch associated files
     orders_count = serializers.SerializerMethodField()  # Get number of orders
 
@@ -77,7 +128,15 @@ class OrderReportSerializer(serializers.ModelSerializer):
         fields = ["id", "report_month", "created_at", "orders", "orders_count", "files", "customer"]
         read_only_fields = ['customer']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get("include_orders"):
+            self.fields.pop("orders")
+
     def get_orders_count(self, obj):
+        # аннотация Count("orders") из report_list_queryset, без неё - отдельный запрос
+        if hasattr(obj, "orders_total"):
+            return obj.orders_total
         return obj.orders.count()
 
 
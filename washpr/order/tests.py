@@ -1,3 +1,73 @@
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from customer.models import Customer
+from place.models import Place
+from .models import Order
+
+User = get_user_model()
+
+
+def create_customer_orders(email, places=3, orders_per_place=4):
+    """ User with a customer, `places` places and `orders_per_place` one-time orders at each. """
+    user = User.objects.create_user(email=email, password="test")
+    customer = Customer.objects.create(user=user, new_company_name="Company")
+    # новая точка сразу ставит create_place_task в очередь - в тестах брокера нет
+    with mock.patch("integration.tasks.create_place_task.delay"):
+        created = [
+            Place.objects.create(
+                customer=customer, place_name=f"Place {number}",
+                rp_city="Praha", rp_street="Street", rp_number=str(number), rp_zip=11000,
+            )
+            for number in range(places)
+        ]
+    for place in created:
+        for _ in range(orders_per_place):
+            Order.objects.create(
+                place=place, user=user, type_ship="one_time",
+                date_pickup=date(2025, 3, 3), date_delivery=date(2025, 3, 5),
+            )
+    return user, created
+
+
+class OrderListQueriesTest(TestCase):
+    """ Order lists load places with a join: one query whatever the number of orders and places. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.places = create_customer_orders("orders@example.com")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_get_place_orders(self):
+        response = self.get(reverse("get_place_orders", args=[self.places[0].id]))
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual({order["place_name"] for order in response.data}, {"Place 0"})
+
+    def test_get_orders(self):
+        response = self.get(reverse("get_orders"))
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(len({order["place_name"] for order in response.data}), 3)
+
+    def test_get_all_orders(self):
+        response = self.get(reverse("get_all_orders"))
+        self.assertEqual(response.data["user_id"], self.user.id)
+        self.assertEqual(len(response.data["orders"]), 12)
 
-# Create your tests here.
+    def test_paginated_orders(self):
+        response = self.get(reverse("get_orders") + "?page_size=5")
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertIsNotNone(response.data["next"])
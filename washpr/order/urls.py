@@ -2,7 +2,8 @@ from django.urls import path
 
 from .models import PhotoReport
 from .views import create_order, get_place_orders, get_orders, update_order, UserReportListView, UserReportDetailView, \
-    GenerateMonthlyReport, get_all_orders, get_current_order, get_photo_reports_orders, download_file_view
+    GenerateMonthlyReport, get_all_orders, get_current_order, get_photo_reports_orders, download_file_view, \
+    export_photos_zip
 
 urlpatterns = [
     path('create/', create_order, name='create_order'),
@@ -14,6 +15,7 @@ urlpatterns = [
 
     path("photos/", get_photo_reports_orders, name="photo-reports"),
     path("photos/download/<int:file_id>/", download_file_view, name="photo-download"),
+    path("photos/export/", export_photos_zip, name="photo-export"),
     path("reports/", UserReportListView.as_view(), name="user-reports"),
     path("reports/<int:pk>/", UserReportDetailView.as_view(), name="report-detail"),
 ]
@@ -3,9 +3,11 @@ import os
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
-from django.db.models import Q
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Count, IntegerField, Max, Prefetch, Q
+from django.db.models.functions import Coalesce, JSONObject
 from django.db.models.expressions import result
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, Http404, StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -15,11 +17,15 @@ from place.models import Place
 from rest_framework.views import APIView
 
 from .models import Order, OrderReport, PhotoReport, ReportFile
+from .filters import filter_orders
+from .pagination import OrderHistoryPagination, PhotoGroupPagination, PhotoReportPagination
 from .serializers import OrderSerializer, GetOrderSerializer, OrderReportSerializer, CurrentOrderSerializer, \
-    PhotoReportSerializer
+    PhotoReportSerializer, PhotoGroupSerializer
 from datetime import datetime
 
-from integration.tasks import RestApiClient
+from integration.archives import filter_photos_for_export, photos_zip_response
+from integration.client import StreamingBody, get_api_client
+from integration.documents import DOCUMENT_URL, cached_photo_response, count, queue_mirror
 from washpr import settings
 from customer.models import Customer
 
@@ -39,7 +45,7 @@ def create_order(request):
         # Получаем данные из запроса
         data = request.data
         # Проверяем, принадлежит ли место текущему пользователю
-        place = Place.objects.get(id=data.get('place'), customer__user=request.user)
+        place = Place.objects.select_related('customer').get(id=data.get('place'), customer__user=request.user)
         # Добавляем валидацию для других полей через сериализатор
         serializer = OrderSerializer(data=data)
         if serializer.is_valid():
@@ -74,9 +80,17 @@ def create_order(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_place_orders(request, place_id):
+    try:
+        orders = filter_orders(Order.objects.filter(place_id=place_id).select_related('place'), request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    paginator = OrderHistoryPagination()
+    if paginator.is_requested(request):
+        page = paginator.paginate_queryset(orders, request)
+        return paginator.get_paginated_response(GetOrderSerializer(page, many=True).data)
     try:
         # Получаем заказы, связанные с данным местом
-        orders = Order.objects.filter(place_id=place_id).order_by('-id')
+        orders = orders.order_by('-id')
 
         # Сериализуем заказы
         serializer = GetOrderSerializer(orders, many=True)
@@ -88,9 +102,19 @@ def get_place_orders(request, place_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_orders(request):
+    # фильтры - order.filters; ?page_size= / ?cursor= - постранично (OrderHistoryPagination),
+    # без них весь список как раньше
+    try:
+        orders = filter_orders(
+            Order.objects.filter(place__customer__user=request.user).select_related('place'), request.query_params
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    paginator = OrderHistoryPagination()
+    if paginator.is_requested(request):
+        page = paginator.paginate_queryset(orders, request)
+        return paginator.get_paginated_response(GetOrderSerializer(page, many=True).data)
     try:
-        user = request.user
-        orders = Order.objects.filter(place__customer__user=user)
         serializer = GetOrderSerializer(orders, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Exception as e:
@@ -116,12 +140,27 @@ def get_current_order(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_all_orders(request):
+    return user_orders_response(request, request.user.id)
+
+
+def user_orders_response(request, user_id):
+    """ {"user_id", "orders"} with the order.filters from the query; "next" is added when paginated. """
+    try:
+        orders = filter_orders(Order.objects.filter(user__id=user_id).select_related('place'), request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    paginator = OrderHistoryPagination()
+    if paginator.is_requested(request):
+        page = paginator.paginate_queryset(orders, request)
+        return Response({
+            "user_id": user_id,
+            "orders": GetOrderSerializer(page, many=True).data,
+            "next": paginator.get_next_link(),
+        }, status=status.HTTP_200_OK)
     try:
-        user = request.user
-        orders = Order.objects.filter(user=user)
         serializer = GetOrderSerializer(orders, many=True)
         return Response({
-            "user_id": request.user.id,
+            "user_id": user_id,
             "orders": serializer.data,
 
         }, status=status.HTTP_200_OK)
@@ -145,18 +184,111 @@ def update_order(request, order_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def photo_groups(photos):
+    """
+    Photos grouped by order pair in one SQL query: a row per group_pair_id (order id for
+    orders without a pair) with the order ids and the photos aggregated by ArrayAgg.
+    """
+    return (
+        photos.annotate(pair=Coalesce("order__group_pair_id", "order_id", output_field=IntegerField()))
+        .values("pair")
+        .annotate(
+            order_ids=ArrayAgg("order_id", distinct=True),
+            last_uploaded_at=Max("uploaded_at"),
+            photos=ArrayAgg(
+                JSONObject(
+                    id="id", order_id="order_id", file_id="file_id", mime="mime", uploaded_at="uploaded_at",
+                    previews_at="previews_at", preview_format="preview_format",
+                ),
+                ordering="id",
+            ),
+        )
+        .order_by("-pair")
+    )
+
+
+def photo_reports_response(request, photos):
+    """
+    Photo list for the customer and admin endpoints:
+      ?group=pair              - grouped by order pair (PhotoGroupSerializer)
+      ?page_size= / ?cursor=   - keyset pages, {"next", "results"}; without them the whole list
+    """
+    if request.query_params.get("group") == "pair":
+        groups = photo_groups(photos)
+        paginator = PhotoGroupPagination()
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(groups, request)
+            return paginator.get_paginated_response(PhotoGroupSerializer(page, many=True).data)
+        return Response(PhotoGroupSerializer(groups, many=True).data, status=status.HTTP_200_OK)
+
+    photos = photos.select_related("order")
+    paginator = PhotoReportPagination()
+    if paginator.is_requested(request):
+        page = paginator.paginate_queryset(photos, request)
+        return paginator.get_paginated_response(PhotoReportSerializer(page, many=True).data)
+    serializer = PhotoReportSerializer(photos, many=True)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_photo_reports_orders(request):
+    # неверный ?cursor= - NotFound из пагинации, ответ 404 формирует DRF
+    return photo_reports_response(request, PhotoReport.objects.filter(order__user=request.user))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_photos_zip(request):
+    """ ZIP of the user's photos for ?group_pair_id=, ?place=, ?report= or ?month=YYYY-MM, streamed as it is built. """
     try:
-        user = request.user
-        photos = PhotoReport.objects.filter(order__user=user)
-        serializer = PhotoReportSerializer(photos, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        photos, label = filter_photos_for_export(PhotoReport.objects.filter(order__user=request.user), request.GET)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return photos_zip_response(photos, f"photos-{label}.zip")
 
 
+def proxy_photo_response(request, photo):
+    """ Streams the photo from Route Planner and queues its copy into the MinIO cache (queue_mirror). """
+    # Запрашиваем файл из внешнего API
+    url = DOCUMENT_URL
+    api_client = get_api_client()
+    params = {"id": photo.file_id}
+    # Range/If-Range передаём дальше, чтобы клиент мог докачать файл (206)
+    # identity - иначе requests распакует gzip и Content-Length не совпадёт с телом
+    headers = {"Accept-Encoding": "identity"}
+    for header in ("Range", "If-Range"):
+        value = request.headers.get(header)
+        if value:
+            headers[header] = value
+
+    try:
+        response = api_client.call_api(
+            url, http_method="GET", params=params, raw=True, wait=False, stream=True, headers=headers
+        )
+        response.raise_for_status()
+    except Exception as exc:
+        raise Http404(f"Не удалось получить файл из внешнего API: {str(exc)}")
+
+    # Определяем MIME-тип: берем его из ответа или из photo.mime, если не пришёл
+    content_type = response.headers.get("Content-Type", photo.mime or "application/octet-stream")
+
+    # Отдаём файл кусками по мере получения, не держа его целиком в памяти воркера
+    if settings.PHOTO_CACHE_ENABLED:
+        count("miss")
+        # в MinIO фото копирует mirror_photo_task, воркер gunicorn только отдаёт ответ
+        queue_mirror(photo)
+    django_response = StreamingHttpResponse(
+        StreamingBody(response), status=response.status_code, content_type=content_type
+    )
+    for header in ("Content-Length", "Content-Range", "Accept-Ranges", "ETag", "Last-Modified"):
+        # у закэшированной копии будет свой ETag, чужой клиенту не отдаём
+        if header in ("ETag", "Last-Modified") and settings.PHOTO_CACHE_ENABLED:
+            continue
+        if header in response.headers:
+            django_response[header] = response.headers[header]
+    return django_response
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -178,39 +310,48 @@ def download_file_view(request, file_id: int):
     # Формируем новое имя файла, используя file_id и извлечённое расширение
     new_file_name = f"{file_id}.{extension}"
 
-    # Запрашиваем файл из внешнего API
-    url = "https://online.auto-gps.eu/cnt/apiItinerary/document"
-    api_key = settings.EXTERNAL_API_KEY
-    api_client = RestApiClient(api_key)
-    params = {"id": file_id}
+    django_response = None
+    if settings.PHOTO_CACHE_ENABLED:
+        # Документы в Route Planner не меняются - повторные скачивания отдаём из MinIO
+        django_response = cached_photo_response(request, photo)
+    if django_response is None:
+        django_response = proxy_photo_response(request, photo)
+    django_response["Content-Disposition"] = f'attachment; filename="{new_file_name}"'
+    django_response["Access-Control-Expose-Headers"] = "Content-Disposition, Content-Length, Content-Range, Accept-Ranges, ETag"
 
-    try:
-        response = api_client.call_api(url, http_method="GET", params=params, raw=True)
-        response.raise_for_status()
-    except Exception as exc:
-        raise Http404(f"Не удалось получить файл из внешнего API: {str(exc)}")
+    return django_response
 
-    # Определяем MIME-тип: берем его из ответа или из photo.mime, если не пришёл
-    content_type = response.headers.get("Content-Type", photo.mime or "application/octet-stream")
 
-    # Формируем HTTP-ответ с заголовком Content-Disposition для скачивания файла
-    django_response = HttpResponse(response.content, content_type=content_type)
-    django_response["Content-Disposition"] = f'attachment; filename="{new_file_name}"'
-    django_response["Access-Control-Expose-Headers"] = "Content-Disposition"
+def report_list_queryset(reports, include_orders=False):
+    """ Reports with orders_total annotated and files (and optionally order ids) prefetched. """
+    reports = reports.annotate(orders_total=Count("orders", distinct=True)).prefetch_related("files")
+    if include_orders:
+        reports = reports.prefetch_related(Prefetch("orders", queryset=Order.objects.only("id")))
+    return reports
 
-    return django_response
+
+def include_report_orders(request, default=False):
+    value = request.query_params.get("include_orders")
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
 
 
 class UserReportListView(generics.ListAPIView, LoginRequiredMixin):
-    """ Returns a list of reports for the authenticated user. """
+    """ Returns a list of reports for the authenticated user. ?include_orders=true adds the order ids. """
     serializer_class = OrderReportSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        # reports = OrderReport.objects.filter(customer__user=self.request.user).order_by("-report_month")
-        # for report in reports:
-        #     print(f"Report {report} with id {report.id} - orders: {report.orders.all()}")
-        return OrderReport.objects.filter(customer__user=self.request.user).order_by("-report_month")
+        return report_list_queryset(
+            OrderReport.objects.filter(customer__user=self.request.user).order_by("-report_month"),
+            include_orders=include_report_orders(self.request),
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["include_orders"] = include_report_orders(self.request)
+        return context
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -222,12 +363,17 @@ class UserReportListView(generics.ListAPIView, LoginRequiredMixin):
 
 
 class UserReportDetailView(generics.RetrieveAPIView, LoginRequiredMixin):
-    """ Returns a specific report by ID. """
+    """ Returns a specific report by ID, with the order ids. """
     serializer_class = OrderReportSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return OrderReport.objects.filter(user=self.request.user)
+        return report_list_queryset(OrderReport.objects.filter(customer__user=self.request.user), include_orders=True)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["include_orders"] = True
+        return context
 
 
 class GenerateMonthlyReport(APIView):
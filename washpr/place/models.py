@@ -1,5 +1,6 @@
 from django.db import models
 from customer.models import Customer
+from utils.sequences import reserve_ids
 from integration.tasks import create_place_task, update_place_task, send_email_deleted_place_task
 
 
@@ -26,21 +27,16 @@ class Place(models.Model):
     def save(self, *args, **kwargs):
         is_new = not self.pk
         if is_new:
-            # Сохраняем новый объект с active=False (по умолчанию не отправлено)
-            super().save(*args, **kwargs)
+            # pk резервируем в sequence, чтобы rp_external_id записался тем же INSERT
+            self.pk = reserve_ids(Place, 1)[0]
             if not self.rp_client_external_id:
                 self.rp_client_external_id = self.customer.rp_client_external_id
                 self.rp_client_name = self.customer.company_name
                 self.rp_client_id = self.customer.rp_client_id
                 self.rp_title = self.place_name
                 self.rp_external_id = f"place_{self.pk}"
-            super().save(update_fields=[
-                'rp_client_external_id',
-                'rp_client_name',
-                'rp_title',
-                'rp_external_id',
-                'rp_client_id'
-            ])
+            kwargs["force_insert"] = True
+            super().save(*args, **kwargs)
             # Если объект новый, его active уже False (не отправлено)
             # Можно выйти, чтобы избежать повторного сохранения сразу после создания
             return
@@ -0,0 +1,113 @@
+import hashlib
+import threading
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+
+from .storageminio import MinioMediaStorage, build_s3_client, get_s3_client
+
+DELIVERY_PROXY = "proxy"
+DELIVERY_PRESIGNED = "presigned"
+DELIVERY_ACCEL = "accel"
+
+_storage = MinioMediaStorage()
+_public_client = None
+_public_client_lock = threading.Lock()
+
+
+def internal_client():
+    """ Client for minio:9000, the address Django and nginx see inside the docker network. """
+    return get_s3_client()
+
+
+def public_client():
+    """ Only signs URLs (no requests), so the browser gets DOCUMENT_PUBLIC_ENDPOINT_URL as host. """
+    global _public_client
+    if _public_client is None:
+        with _public_client_lock:
+            if _public_client is None:
+                _public_client = build_s3_client(settings.DOCUMENT_PUBLIC_ENDPOINT_URL)
+    return _public_client
+
+
+def content_disposition(download_name):
+    return f'attachment; filename="{quote(download_name)}"; filename*=UTF-8\'\'{quote(download_name)}'
+
+
+class ObjectBody:
+    """ Iterable over the body of an S3 get_object for StreamingHttpResponse, closed by Django. """
+
+    def __init__(self, body, chunk_size=None):
+        self.body = body
+        self.chunk_size = chunk_size or settings.ROUTE_PLANNER_STREAM_CHUNK_SIZE
+
+    def __iter__(self):
+        return self.body.iter_chunks(chunk_size=self.chunk_size)
+
+    def close(self):
+        self.body.close()
+
+
+def cached_url(name, sign, expires):
+    """
+    sign() once per process for `name`, reused for expires - PRESIGNED_URL_CACHE_MARGIN seconds,
+    so a link taken from the cache is still valid at least for the margin.
+    """
+    ttl = expires - settings.PRESIGNED_URL_CACHE_MARGIN
+    if ttl <= 0:
+        return sign()
+    cache = caches[settings.PRESIGNED_URL_CACHE]
+    # в имени файла могут быть пробелы и юникод, ключ кэша делаем из хэша
+    cache_key = hashlib.md5(name.encode(), usedforsecurity=False).hexdigest()
+    url = cache.get(cache_key)
+    if url is None:
+        url = sign()
+        cache.set(cache_key, url, ttl)
+    return url
+
+
+def presigned_url(client, key, download_name=None, content_type=None, expires=None):
+    params = {"Bucket": _storage.bucket_name, "Key": key}
+    if download_name:
+        # MinIO сам отдаст нужные заголовки, Django в передаче не участвует
+        params["ResponseContentDisposition"] = content_disposition(download_name)
+    if content_type:
+        params["ResponseContentType"] = content_type
+    return client.generate_presigned_url(
+        "get_object", Params=params, ExpiresIn=expires or settings.DOCUMENT_URL_EXPIRE
+    )
+
+
+def storage_file_response(key, download_name, content_type=None, mode=None):
+    """
+    Response for a file in the MinIO bucket after the permission check was done by the view.
+
+    DOCUMENT_DELIVERY_MODE:
+      proxy     - Django streams the object (fallback, works without nginx);
+      presigned - 302 to a short-lived presigned URL on DOCUMENT_PUBLIC_ENDPOINT_URL;
+      accel     - X-Accel-Redirect, nginx downloads the presigned URL from minio:9000
+                  through the internal DOCUMENT_ACCEL_LOCATION and sends it to the client.
+    """
+    mode = mode or settings.DOCUMENT_DELIVERY_MODE
+
+    if mode == DELIVERY_PRESIGNED:
+        return HttpResponseRedirect(presigned_url(public_client(), key, download_name, content_type))
+
+    if mode == DELIVERY_ACCEL:
+        url = urlsplit(presigned_url(internal_client(), key, download_name, content_type))
+        response = HttpResponse(content_type=content_type or "application/octet-stream")
+        # путь и подпись передаём отдельным заголовком: nginx не должен декодировать и менять URI
+        response["X-Accel-Redirect"] = settings.DOCUMENT_ACCEL_LOCATION
+        response["X-Accel-Storage-Uri"] = f"{url.path}?{url.query}"
+        response["Content-Disposition"] = content_disposition(download_name)
+        return response
+
+    obj = internal_client().get_object(Bucket=_storage.bucket_name, Key=key)
+    response = StreamingHttpResponse(
+        ObjectBody(obj["Body"]), content_type=content_type or obj.get("ContentType") or "application/octet-stream"
+    )
+    response["Content-Length"] = obj["ContentLength"]
+    response["Content-Disposition"] = content_disposition(download_name)
+    return response
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db import models
+from rest_framework import serializers
+
+from .downloads import cached_url
+
+
+class CachedFileField(serializers.FileField):
+    """ FileField whose presigned URL is signed once and then taken from the cache. """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        storage = value.storage
+        url = cached_url(
+            f"{getattr(storage, 'bucket_name', '')}/{value.name}",
+            lambda: storage.url(value.name),
+            settings.AWS_QUERYSTRING_EXPIRE,
+        )
+        request = self.context.get("request", None)
+        if request is not None and url.startswith("/"):
+            return request.build_absolute_uri(url)
+        return url
+
+
+class CachedFileUrlsMixin:
+    """ For ModelSerializer: model FileFields become CachedFileField, validators stay as generated. """
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.FileField: CachedFileField,
+    }
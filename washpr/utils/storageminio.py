@@ -1,5 +1,77 @@
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+from django.conf import settings
 from storages.backends.s3boto3 import S3Boto3Storage
 
+_s3_client = None
+_s3_resource_class = None
+_s3_lock = threading.Lock()
+
+
+def build_s3_client(endpoint_url=None):
+    """ New S3 client for MinIO with the pool size and retry mode from settings. """
+    session = boto3.session.Session()
+    return session.client(
+        "s3",
+        endpoint_url=endpoint_url or settings.AWS_S3_ENDPOINT_URL,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_S3_REGION_NAME,
+        config=Config(
+            signature_version="s3v4",
+            max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS,
+            retries={"total_max_attempts": settings.AWS_S3_MAX_ATTEMPTS, "mode": settings.AWS_S3_RETRY_MODE},
+        ),
+    )
+
+
+def get_s3_client():
+    """
+    Process-wide S3 client. boto3 clients are thread-safe, so every thread and every
+    MinioMediaStorage share one endpoint model and one urllib3 connection pool
+    instead of building a session per request.
+    """
+    global _s3_client, _s3_resource_class
+    if _s3_client is None:
+        with _s3_lock:
+            if _s3_client is None:
+                client = build_s3_client()
+                # класс ресурса создаётся из модели сервиса один раз, дальше только оборачиваем клиент
+                _s3_resource_class = type(boto3.session.Session().resource(
+                    "s3", region_name=settings.AWS_S3_REGION_NAME, endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+                ))
+                _s3_client = client
+    return _s3_client
+
+
+def get_s3_resource():
+    """ Resources are not thread-safe, so each thread gets its own, built around the shared client. """
+    client = get_s3_client()
+    return _s3_resource_class(client=client)
+
+
+def _reset_s3_client():
+    # Celery prefork children must not share the parent's sockets
+    global _s3_client, _s3_lock
+    _s3_client = None
+    _s3_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_s3_client)
+
+
 class MinioMediaStorage(S3Boto3Storage):
     bucket_name = "washservice"
     custom_domain = False
+
+    @property
+    def connection(self):
+        connection = getattr(self._connections, "connection", None)
+        # после fork общий клиент пересоздаётся, ресурс со старым клиентом не используем
+        if connection is None or connection.meta.client is not get_s3_client():
+            connection = self._connections.connection = get_s3_resource()
+        return connection
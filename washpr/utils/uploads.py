@@ -0,0 +1,164 @@
+import math
+import mimetypes
+import os
+import uuid
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+
+from .downloads import public_client
+from .storageminio import MinioMediaStorage, get_s3_client
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Двухшаговая загрузка: Django подписывает форму (или части multipart), браузер грузит
+# файл прямо в MinIO, затем подтверждает загрузку и Django создаёт запись с готовым ключом
+UPLOAD_SALT = "utils.uploads"
+S3_MAX_PARTS = 10000
+
+_storage = MinioMediaStorage()
+
+
+def guess_content_type(filename):
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def presigned_post(key, content_type, max_size):
+    """ Form for a browser POST to MinIO; the policy rejects other sizes and content types. """
+    return public_client().generate_presigned_post(
+        Bucket=_storage.bucket_name,
+        Key=key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, max_size],
+        ],
+        ExpiresIn=settings.UPLOAD_URL_EXPIRE,
+    )
+
+
+def start_multipart(key, content_type, size):
+    """ Creates a multipart upload and signs a PUT URL for every part. """
+    part_size = max(settings.UPLOAD_MULTIPART_PART_SIZE, math.ceil(size / S3_MAX_PARTS))
+    upload = get_s3_client().create_multipart_upload(Bucket=_storage.bucket_name, Key=key, ContentType=content_type)
+    signer = public_client()
+    parts = [
+        {
+            "part_number": number,
+            "url": signer.generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": _storage.bucket_name, "Key": key,
+                    "UploadId": upload["UploadId"], "PartNumber": number,
+                },
+                ExpiresIn=settings.UPLOAD_URL_EXPIRE,
+            ),
+        }
+        for number in range(1, math.ceil(size / part_size) + 1)
+    ]
+    return upload["UploadId"], part_size, parts
+
+
+def abort_multipart(key, upload_id):
+    try:
+        get_s3_client().abort_multipart_upload(Bucket=_storage.bucket_name, Key=key, UploadId=upload_id)
+    except ClientError as e:
+        logger.warning(f"Multipart upload {key} was not aborted: {e}")
+
+
+def delete_object(key):
+    get_s3_client().delete_object(Bucket=_storage.bucket_name, Key=key)
+
+
+def upload_key(instance, filename):
+    """
+    Key for a presigned upload: upload_to path with a random suffix in the file name.
+    Nothing reserves the key until confirm, so two uploads of the same name must not get the same one.
+    """
+    field = instance._meta.get_field("file")
+    stem, ext = os.path.splitext(os.path.basename(filename))
+    suffix = f"_{uuid.uuid4().hex[:12]}{ext}"
+    key = field.generate_filename(instance, stem + suffix)
+    overflow = len(key) - field.max_length
+    if overflow > 0:
+        # длинное имя укорачиваем, случайную часть оставляем
+        if overflow >= len(stem):
+            raise ValueError("File name is too long.")
+        key = field.generate_filename(instance, stem[:-overflow] + suffix)
+    return key
+
+
+def begin_upload(instance, owner_id, filename, size, content_type, max_size, allow_multipart=False):
+    """
+    Step 1. `instance` is an unsaved model with a `file` FileField, used to build the key
+    exactly as upload_to would. Returns the form (or part URLs) and a signed token for step 2.
+    ValueError for a file the model would not accept.
+    """
+    if size <= 0 or size > max_size:
+        raise ValueError(f"The maximum file size that can be uploaded is {max_size // (1024 * 1024)}MB.")
+
+    key = upload_key(instance, filename)
+    upload_id = None
+    if allow_multipart and size > settings.UPLOAD_MULTIPART_THRESHOLD:
+        upload_id, part_size, parts = start_multipart(key, content_type, size)
+        payload = {"multipart": True, "part_size": part_size, "parts": parts}
+    else:
+        payload = {"multipart": False, **presigned_post(key, content_type, max_size)}
+
+    payload["key"] = key
+    payload["token"] = signing.dumps(
+        {"model": instance._meta.label, "owner": owner_id, "key": key, "upload_id": upload_id},
+        salt=UPLOAD_SALT,
+    )
+    return payload
+
+
+def read_upload(token, model, owner_id):
+    try:
+        # после UPLOAD_URL_EXPIRE загрузить файл уже нельзя, значит и подтверждать нечего
+        upload = signing.loads(token or "", salt=UPLOAD_SALT, max_age=settings.UPLOAD_URL_EXPIRE)
+    except signing.SignatureExpired:
+        raise ValueError("Upload token has expired")
+    except signing.BadSignature:
+        raise ValueError("Invalid upload token")
+    # токен, выданный для другого клиента или отчёта, здесь не принимаем
+    if upload["model"] != model._meta.label or upload["owner"] != owner_id:
+        raise ValueError("Invalid upload token")
+    return upload
+
+
+def finish_upload(token, model, owner_id, max_size, parts=None):
+    """
+    Step 2. Completes a multipart upload, checks that the object is in the bucket
+    and returns its key for the new row. ValueError if there is nothing to record.
+    """
+    upload = read_upload(token, model, owner_id)
+    key = upload["key"]
+    client = get_s3_client()
+
+    if upload["upload_id"]:
+        try:
+            client.complete_multipart_upload(
+                Bucket=_storage.bucket_name, Key=key, UploadId=upload["upload_id"],
+                MultipartUpload={"Parts": sorted(
+                    ({"PartNumber": int(part["part_number"]), "ETag": part["etag"]} for part in parts or []),
+                    key=lambda part: part["PartNumber"],
+                )},
+            )
+        except (ClientError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Upload is not complete: {e}")
+
+    try:
+        head = client.head_object(Bucket=_storage.bucket_name, Key=key)
+    except ClientError:
+        raise ValueError("File was not uploaded")
+    if head["ContentLength"] > max_size:
+        delete_object(key)
+        raise ValueError(f"The maximum file size that can be uploaded is {max_size // (1024 * 1024)}MB.")
+    # повторное подтверждение того же токена не создаёт вторую запись
+    if model.objects.filter(file=key).exists():
+        raise ValueError("Upload is already confirmed")
+    return key
@@ -34,6 +34,10 @@ app.conf.beat_schedule = {
         # 'schedule': crontab(minute=0, hour='4-23'),
         'schedule': crontab(minute='*/1'),
     },
+    "evict-photo-cache-every-hour": {
+        "task": "integration.tasks.evict_photo_cache_task",
+        "schedule": crontab(minute=15),
+    },
     "generate_monthly_reports": {
         "task": "integration.tasks.generate_monthly_reports_task",
         "schedule": crontab(day_of_month=1, hour=1, minute=0),
@@ -162,6 +162,24 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/1")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Подписанные ссылки на файлы в MinIO (utils.downloads.cached_url). Кэш в памяти процесса:
+    # запрос в Redis стоит столько же, сколько сама подпись SigV4
+    "presigned_urls": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "presigned-urls",
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("PRESIGNED_URL_CACHE_ENTRIES", 20000))},
+    },
+}
+PRESIGNED_URL_CACHE = "presigned_urls"
+# ссылка из кэша живёт ещё минимум столько секунд
+PRESIGNED_URL_CACHE_MARGIN = int(os.getenv("PRESIGNED_URL_CACHE_MARGIN", 600))
+
 CELERY_BROKER_URL = 'redis://redis:6379/0'
 CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
@@ -186,6 +204,50 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
 
 EXTERNAL_API_KEY = os.getenv("EXTERNAL_API_KEY")
 
+# Пул соединений к Route Planner (online.auto-gps.eu)
+ROUTE_PLANNER_POOL_CONNECTIONS = int(os.getenv("ROUTE_PLANNER_POOL_CONNECTIONS", 4))  # число пулов (хостов)
+ROUTE_PLANNER_POOL_MAXSIZE = int(os.getenv("ROUTE_PLANNER_POOL_MAXSIZE", 10))  # соединений на хост
+ROUTE_PLANNER_CONNECT_TIMEOUT = float(os.getenv("ROUTE_PLANNER_CONNECT_TIMEOUT", 5))
+ROUTE_PLANNER_READ_TIMEOUT = float(os.getenv("ROUTE_PLANNER_READ_TIMEOUT", 30))
+# Размер куска при потоковой отдаче фото (байт) - столько держим в памяти на одно скачивание
+ROUTE_PLANNER_STREAM_CHUNK_SIZE = int(os.getenv("ROUTE_PLANNER_STREAM_CHUNK_SIZE", 64 * 1024))
+
+# Общий для всех воркеров лимит запросов к Route Planner (token bucket в Redis)
+ROUTE_PLANNER_RATE_LIMIT = float(os.getenv("ROUTE_PLANNER_RATE_LIMIT", 5))  # запросов в секунду
+ROUTE_PLANNER_RATE_BURST = int(os.getenv("ROUTE_PLANNER_RATE_BURST", 10))
+ROUTE_PLANNER_RATE_MAX_WAIT = float(os.getenv("ROUTE_PLANNER_RATE_MAX_WAIT", 120))  # секунд
+ROUTE_PLANNER_DEFAULT_RETRY_AFTER = int(os.getenv("ROUTE_PLANNER_DEFAULT_RETRY_AFTER", 60))
+
+# Кэш фото из Route Planner в MinIO (integration.documents)
+PHOTO_CACHE_ENABLED = os.getenv("PHOTO_CACHE_ENABLED", "True") == "True"
+PHOTO_CACHE_MAX_BYTES = int(os.getenv("PHOTO_CACHE_MAX_BYTES", 5 * 1024 ** 3))  # выше - вытесняем старые
+PHOTO_CACHE_EVICT_TO = float(os.getenv("PHOTO_CACHE_EVICT_TO", 0.9))  # доля лимита после вытеснения
+PHOTO_CACHE_MAX_AGE = int(os.getenv("PHOTO_CACHE_MAX_AGE", 365 * 24 * 3600))  # Cache-Control для браузера
+PHOTO_CACHE_SPOOL_SIZE = int(os.getenv("PHOTO_CACHE_SPOOL_SIZE", 1024 * 1024))  # больше - пишем во временный файл
+
+# Фоновое копирование новых фото в MinIO (очередь "photos", отдельный воркер)
+PHOTO_MIRROR_ENABLED = os.getenv("PHOTO_MIRROR_ENABLED", "True") == "True"
+PHOTO_MIRROR_MAX_RETRIES = int(os.getenv("PHOTO_MIRROR_MAX_RETRIES", 5))
+PHOTO_MIRROR_RETRY_DELAY = int(os.getenv("PHOTO_MIRROR_RETRY_DELAY", 60))  # секунд, удваивается с каждой попыткой
+# "queued" старше этого (секунд) - задача потеряна, промах кэша ставит фото в очередь снова
+PHOTO_MIRROR_QUEUE_TIMEOUT = int(os.getenv("PHOTO_MIRROR_QUEUE_TIMEOUT", 3600))
+
+# Уменьшенные копии фото для галереи (очередь "previews", prefork-воркер)
+PHOTO_PREVIEWS_ENABLED = os.getenv("PHOTO_PREVIEWS_ENABLED", "True") == "True"
+PHOTO_PREVIEW_FORMAT = os.getenv("PHOTO_PREVIEW_FORMAT", "WEBP")  # WEBP или JPEG
+PHOTO_PREVIEW_QUALITY = int(os.getenv("PHOTO_PREVIEW_QUALITY", 75))
+PHOTO_THUMB_SIZE = int(os.getenv("PHOTO_THUMB_SIZE", 256))  # px по длинной стороне
+PHOTO_PREVIEW_SIZE = int(os.getenv("PHOTO_PREVIEW_SIZE", 1280))
+PHOTO_PREVIEW_URL_EXPIRE = int(os.getenv("PHOTO_PREVIEW_URL_EXPIRE", 3600))  # секунд жизни ссылки
+
+# ZIP-выгрузка фото: сколько файлов качается параллельно и сколько кусков каждого ждёт в очереди.
+# Память на одну выгрузку ~ PREFETCH * QUEUE_CHUNKS * ROUTE_PLANNER_STREAM_CHUNK_SIZE
+PHOTO_ZIP_PREFETCH = int(os.getenv("PHOTO_ZIP_PREFETCH", 4))
+PHOTO_ZIP_QUEUE_CHUNKS = int(os.getenv("PHOTO_ZIP_QUEUE_CHUNKS", 8))
+
+# Сколько заказов send_orders_task отправляет одновременно (1 - по одному)
+SEND_ORDERS_CONCURRENCY = int(os.getenv("SEND_ORDERS_CONCURRENCY", 4))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=360),  # Токен будет действовать 360 минут
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),     # Refresh токен будет действовать 7 дней
@@ -217,3 +279,23 @@ AWS_S3_REGION_NAME = os.getenv("AWS_S3_REGION_NAME", "us-east-1")
 
 AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
+AWS_QUERYSTRING_EXPIRE = int(os.getenv("AWS_QUERYSTRING_EXPIRE", 3600))  # секунд жизни ссылки в file.url
+# Общий на процесс S3-клиент (utils.storageminio.get_s3_client)
+AWS_S3_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_S3_MAX_POOL_CONNECTIONS", 20))
+AWS_S3_RETRY_MODE = os.getenv("AWS_S3_RETRY_MODE", "standard")
+AWS_S3_MAX_ATTEMPTS = int(os.getenv("AWS_S3_MAX_ATTEMPTS", 3))  # всего попыток, включая первую
+
+# Как отдавать документы и счета из MinIO (utils.downloads):
+# proxy - через Django, presigned - редирект на подписанную ссылку, accel - X-Accel-Redirect в nginx
+DOCUMENT_DELIVERY_MODE = os.getenv("DOCUMENT_DELIVERY_MODE", "proxy")
+DOCUMENT_URL_EXPIRE = int(os.getenv("DOCUMENT_URL_EXPIRE", 60))  # секунд жизни подписанной ссылки
+# адрес MinIO, доступный из браузера (для presigned)
+DOCUMENT_PUBLIC_ENDPOINT_URL = os.getenv("DOCUMENT_PUBLIC_ENDPOINT_URL", AWS_S3_ENDPOINT_URL)
+DOCUMENT_ACCEL_LOCATION = os.getenv("DOCUMENT_ACCEL_LOCATION", "/protected-minio/")
+
+# Загрузка файлов напрямую в MinIO (utils.uploads): Django только подписывает и подтверждает
+UPLOAD_URL_EXPIRE = int(os.getenv("UPLOAD_URL_EXPIRE", 3600))  # секунд жизни подписанной формы/частей
+REPORT_FILE_MAX_SIZE = int(os.getenv("REPORT_FILE_MAX_SIZE", 2 * 1024 ** 3))  # 2 GB
+# счета больше этого размера грузятся частями (S3 multipart), часть не меньше 5 MB
+UPLOAD_MULTIPART_THRESHOLD = int(os.getenv("UPLOAD_MULTIPART_THRESHOLD", 64 * 1024 ** 2))
+UPLOAD_MULTIPART_PART_SIZE = max(int(os.getenv("UPLOAD_MULTIPART_PART_SIZE", 16 * 1024 ** 2)), 5 * 1024 ** 2)